@@ -0,0 +1,78 @@
+"""
+Times and sizes of the Chapter model with a large selection, run with `invoke bench` or
+`python -m benchmarks.chapter_model [chapter count]`.
+"""
+import dataclasses
+import pickle
+import sys
+import timeit
+import tracemalloc
+import uuid
+
+from mangadex_mass_uploader.chapter_parser import Chapter
+
+CHAPTER_COUNT = 10000
+REPEAT = 5
+
+
+def api_chapter(idx: int) -> dict:
+    relationships = [{"type": "scanlation_group", "id": str(uuid.uuid4())} for _ in range(idx % 3)]
+    relationships += [
+        {"type": "manga", "id": str(uuid.uuid4())},
+        {"type": "user", "id": str(uuid.uuid4())},
+    ]
+    return {
+        "id": str(uuid.uuid4()),
+        "type": "chapter",
+        "attributes": {
+            "volume": str(idx // 10),
+            "chapter": str(idx),
+            "title": f"Chapter {idx}",
+            "translatedLanguage": "en",
+            "externalUrl": None,
+            "version": 1,
+        },
+        "relationships": relationships,
+    }
+
+
+def best_of(statement) -> float:
+    return min(timeit.repeat(statement, number=1, repeat=REPEAT)) * 1000
+
+
+def report(name: str, value: float, unit: str) -> None:
+    print(f"{name:<32}{value:>12.2f} {unit}")
+
+
+def main(chapter_count: int = CHAPTER_COUNT) -> None:
+    api_chapters = [api_chapter(idx) for idx in range(chapter_count)]
+    print(f"{chapter_count} chapters, best of {REPEAT}")
+
+    tracemalloc.start()
+    chapters = [Chapter.from_api(chapter) for chapter in api_chapters]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    report("memory per chapter", memory / chapter_count, "B")
+
+    report("from_api", best_of(lambda: [Chapter.from_api(ch) for ch in api_chapters]), "ms")
+    report("to_api", best_of(lambda: [ch.to_api() for ch in chapters]), "ms")
+    report(
+        "dataclasses.replace",
+        best_of(lambda: [dataclasses.replace(ch, title="") for ch in chapters]),
+        "ms",
+    )
+    if hasattr(Chapter, "copy"):
+        report("copy", best_of(lambda: [ch.copy(title="") for ch in chapters]), "ms")
+        edited = [ch.copy(title="") for ch in chapters]
+        report("diff", best_of(lambda: [a.diff(b) for a, b in zip(chapters, edited)]), "ms")
+    report("str", best_of(lambda: [str(ch) for ch in chapters]), "ms")
+
+    backup = {"old": chapters, "new": chapters}
+    report("pickled size per chapter", len(pickle.dumps(backup)) / chapter_count, "B")
+    report("pickle.dumps", best_of(lambda: pickle.dumps(backup)), "ms")
+    pickled = pickle.dumps(backup)
+    report("pickle.loads", best_of(lambda: pickle.loads(pickled)), "ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
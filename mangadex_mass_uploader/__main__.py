@@ -0,0 +1,18 @@
+import sys
+
+from mangadex_mass_uploader.cli import ACTIONS
+
+
+def main():
+    # the GUI stack is only imported when the GUI is actually going to run
+    if len(sys.argv) > 1 and sys.argv[1] in (*ACTIONS, "-h", "--help"):
+        from mangadex_mass_uploader.cli import main as cli_main
+
+        sys.exit(cli_main())
+    from mangadex_mass_uploader.main import main as gui_main
+
+    gui_main()
+
+
+if __name__ == "__main__":
+    main()
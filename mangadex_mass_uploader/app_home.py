@@ -0,0 +1,16 @@
+import os
+
+APP_HOME = "~/.md_mass_uploader"
+APP_FOLDERS = ("logins", "edits", "edit_logs", "uploads", "stats")
+
+
+def init_app_home(path: str | None = None) -> str:
+    """
+    Points KIVY_HOME at the folder with the logins, backups, upload journal and request stats,
+    and creates it.
+    The CLI uses it as well, so this must not import kivy.
+    """
+    os.environ["KIVY_HOME"] = os.path.abspath(os.path.expanduser(path or APP_HOME))
+    for folder in APP_FOLDERS:
+        os.makedirs(f"{os.environ['KIVY_HOME']}/{folder}", exist_ok=True)
+    return os.environ["KIVY_HOME"]
@@ -0,0 +1,651 @@
+import asyncio
+import logging
+import socket
+import ssl
+import threading
+from base64 import b64encode
+from concurrent.futures import Future
+from itertools import chain
+from json import dumps, loads
+from time import monotonic, time
+from typing import Any, Callable, Coroutine, TypeVar
+from urllib.parse import unquote, urlencode, urljoin, urlsplit
+
+import requests
+from requests.models import DEFAULT_REDIRECT_LIMIT
+from requests.utils import get_environ_proxies, select_proxy
+
+from mangadex_mass_uploader.mangadex_api import MangaDexAPI
+from mangadex_mass_uploader.page_stream import ChapterArchive, MultipartPageStream
+from mangadex_mass_uploader.rate_limiter import route_of
+from mangadex_mass_uploader.request_stats import body_size
+from mangadex_mass_uploader.upload_journal import UploadJournal
+from mangadex_mass_uploader.utils import Singleton
+
+T = TypeVar("T")
+
+
+class AsyncResponse:
+    def __init__(self, status_code: int, headers: dict[str, str], content: bytes):
+        self.status_code = status_code
+        # header names are lowercased, same lookups as requests' case insensitive dict
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return loads(self.content)
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to a single origin, optionally through an http proxy.
+    Connections are opened as they're needed, up to size, and reused once their response has
+    been read. Socket errors and timeouts are raised as the requests exceptions, so callers
+    handle them the same way for both clients.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, url: str, size: int, proxy: str | None = None):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        default_port = 443 if parts.scheme == "https" else 80
+        self.host_header = self.host if self.port == default_port else f"{self.host}:{self.port}"
+        self._ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self._proxy = urlsplit(proxy) if proxy is not None else None
+        if self._proxy is not None and self._proxy.scheme != "http":
+            raise requests.exceptions.InvalidProxyURL(f"Only http proxies are supported: {proxy}")
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.num_connections = 0
+        self.num_requests = 0
+
+    @property
+    def _proxy_headers(self) -> dict[str, str]:
+        if self._proxy is None or self._proxy.username is None:
+            return {}
+        credentials = f"{unquote(self._proxy.username)}:{unquote(self._proxy.password or '')}"
+        return {"Proxy-Authorization": f"Basic {b64encode(credentials.encode()).decode()}"}
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        body: bytes | MultipartPageStream | None,
+        timeout: tuple[float, float],
+    ) -> AsyncResponse:
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        if self._proxy is not None and self._ssl is None:
+            # plain http goes through the proxy as is, only https needs a tunnel
+            target = url
+            headers = headers | self._proxy_headers
+        async with self._slots:
+            reader, writer = await self._connection(timeout[0])
+            self.num_requests += 1
+            try:
+                await asyncio.wait_for(
+                    self._send(writer, method, target, headers, body), timeout[1]
+                )
+                response, keep_alive = await asyncio.wait_for(
+                    self._receive(reader, method), timeout[1]
+                )
+            except asyncio.TimeoutError as exception:
+                writer.close()
+                raise requests.ReadTimeout(f"{method} {url} timed out") from exception
+            except (OSError, asyncio.IncompleteReadError, ValueError) as exception:
+                writer.close()
+                raise requests.ConnectionError(f"{method} {url}: {exception!r}") from exception
+            except BaseException:
+                # cancelled halfway through, the connection is in an unknown state
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return response
+
+    async def _connection(
+        self, connect_timeout: float
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            # the server closed it while it was idle
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        try:
+            connection = await asyncio.wait_for(self._open(connect_timeout), connect_timeout)
+        except (asyncio.TimeoutError, socket.timeout) as exception:
+            raise requests.ConnectTimeout(f"connecting to {self.host} timed out") from exception
+        except requests.ConnectionError:
+            raise
+        except OSError as exception:
+            raise requests.ConnectionError(f"{self.host}: {exception!r}") from exception
+        self.num_connections += 1
+        return connection
+
+    async def _open(self, timeout: float) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self._proxy is None:
+            return await asyncio.open_connection(self.host, self.port, ssl=self._ssl)
+        if self._ssl is None:
+            return await asyncio.open_connection(self._proxy.hostname, self._proxy.port or 80)
+        # the CONNECT handshake is a couple of blocking reads on a fresh socket, so it's done in
+        # a thread and the tunnelled socket is handed to asyncio for the TLS handshake
+        sock = await asyncio.to_thread(self._tunnel, timeout)
+        try:
+            return await asyncio.open_connection(
+                sock=sock, ssl=self._ssl, server_hostname=self.host
+            )
+        except BaseException:
+            sock.close()
+            raise
+
+    def _tunnel(self, timeout: float) -> socket.socket:
+        sock = socket.create_connection((self._proxy.hostname, self._proxy.port or 80), timeout)
+        try:
+            head = f"CONNECT {self.host}:{self.port} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            for name, value in self._proxy_headers.items():
+                head += f"{name}: {value}\r\n"
+            sock.sendall(f"{head}\r\n".encode("latin-1"))
+            with sock.makefile("rb") as response:
+                status_line = response.readline().decode("latin-1")
+                while response.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+            status = status_line.split(" ", 2)
+            if len(status) < 2 or status[1] != "200":
+                raise requests.exceptions.ProxyError(
+                    f"Proxy refused to tunnel to {self.host}: {status_line.strip()}"
+                )
+            sock.setblocking(False)
+            return sock
+        except BaseException:
+            sock.close()
+            raise
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        target: str,
+        headers: dict[str, str],
+        body: bytes | MultipartPageStream | None,
+    ) -> None:
+        head = f"{method} {target} HTTP/1.1\r\nHost: {self.host_header}\r\n"
+        for name, value in headers.items():
+            head += f"{name}: {value}\r\n"
+        writer.write(f"{head}\r\n".encode("latin-1"))
+        if isinstance(body, bytes):
+            writer.write(body)
+        elif body is not None:
+            # deflated pages are decompressed as they're read, so the reads happen in a thread
+            # and the chunks are sent a chunk at a time, waiting for the socket to drain
+            while chunk := await asyncio.to_thread(body.read, self.CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+        await writer.drain()
+
+    async def _receive(
+        self, reader: asyncio.StreamReader, method: str
+    ) -> tuple[AsyncResponse, bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before a response was sent")
+        version, status_code, *_ = status_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        status_code = int(status_code)
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b""
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            content = await self._read_chunked(reader)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            # no length, the body ends when the server closes the connection
+            content = await reader.read()
+            keep_alive = False
+        return AsyncResponse(status_code, headers, content), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        # trailers
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+class AsyncMangaDexAPI(metaclass=Singleton):
+    """
+    asyncio counterpart of MangaDexAPI, so hundreds of requests can be in flight without a
+    thread for each of them. Everything runs on one event loop in a background thread, and
+    coroutines are handed to it with submit from any other thread.
+    Login, tokens, rate limits, retries, stats and the chapter cache are shared with
+    MangaDexAPI. Chapter uploads only go through this client, so it's the only one that
+    opens and tracks upload sessions.
+    """
+
+    # each in-flight request needs its own connection with HTTP/1.1
+    POOL_SIZE = 200
+    PAGE_UPLOAD_WORKERS = 20
+    # the API only lets a user have one open upload session at a time
+    MAX_UPLOAD_SESSIONS = 1
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+    def __init__(self):
+        self.logger = logging.getLogger("main")
+        self.api = MangaDexAPI()
+        self.loop = asyncio.new_event_loop()
+        self._pools: dict[str, ConnectionPool] = {}
+        self._upload_slots = asyncio.Semaphore(self.MAX_UPLOAD_SESSIONS)
+        self._open_sessions: set[str] = set()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        coroutine: Coroutine[Any, Any, T],
+        callback: Callable[[Future], None] | None = None,
+    ) -> "Future[T]":
+        """
+        Schedules coroutine on the event loop. callback is called with the finished future on
+        the loop thread, GUI code should pass a function decorated with kivy's mainthread.
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        # blocking shortcut for sync code, must not be called from the loop thread itself
+        return self.submit(coroutine).result()
+
+    def close(self) -> None:
+        def stop():
+            for pool in self._pools.values():
+                pool.close()
+            self.loop.stop()
+
+        self.loop.call_soon_threadsafe(stop)
+        self._thread.join()
+
+    @property
+    def connection_stats(self) -> dict[str, dict[str, int]]:
+        return {
+            origin: {
+                "requests": pool.num_requests,
+                "new": pool.num_connections,
+                "reused": pool.num_requests - pool.num_connections,
+            }
+            for origin, pool in self._pools.items()
+        }
+
+    def _pool(self, url: str) -> ConnectionPool:
+        # one pool per origin, created on the loop the first time a url on it is requested,
+        # with the same proxy requests would pick from the environment
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._pools:
+            proxy = select_proxy(url, get_environ_proxies(url))
+            self._pools[origin] = ConnectionPool(origin, self.POOL_SIZE, proxy)
+        return self._pools[origin]
+
+    async def session_token(self) -> str:
+        # refreshing is rare and already thread safe in MangaDexAPI, so it's left to a thread
+        if self.api.session_token_expired:
+            return await asyncio.to_thread(lambda: self.api.session_token)
+        return self.api.session_token
+
+    async def send_request(
+        self,
+        method: str,
+        endpoint: str,
+        req_auth: bool = True,
+        on_error: Callable[[int, dict | None], None] = MangaDexAPI.raise_on_error,
+        auth_url: bool = False,
+        params: dict | None = None,
+        json: dict | None = None,
+        data: MultipartPageStream | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> dict:
+        api_url = self.api.AUTH_URL if auth_url else self.api.API_URL
+        headers = {"Accept": "application/json"} | (headers or {})
+        if req_auth:
+            headers["Authorization"] = f"Bearer {await self.session_token()}"
+        url = f"{api_url}/{endpoint}"
+        if params:
+            # lists become repeated keys, same as requests does it
+            url += "?" + urlencode(
+                {key: value for key, value in params.items() if value is not None}, doseq=True
+            )
+        body = data
+        if json is not None:
+            body = dumps(json).encode()
+            headers["Content-Type"] = "application/json"
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+        route = route_of(method, endpoint, auth_url)
+        response = await self.send_with_retries(
+            route, endpoint, method.upper(), url, headers, body
+        )
+        self.api.invalidate_cache(method, endpoint, auth_url)
+        if isinstance(response, dict):
+            return response
+        if not response.ok:
+            on_error(response.status_code, response.json())
+        return response.json()
+
+    async def send_with_retries(
+        self,
+        route: str,
+        endpoint: str,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        body: bytes | MultipartPageStream | None,
+    ) -> AsyncResponse | dict:
+        # same policy as MangaDexAPI.send_with_retries, waiting with asyncio.sleep instead
+        rate_limiter = self.api.rate_limiter
+        retry_policy = self.api.retry_policy
+        attempt = 0
+        while True:
+            while True:
+                wait, reserved = rate_limiter.reserve(route, not route.endswith(" auth"))
+                await asyncio.sleep(wait)
+                if wait:
+                    self.api.stats.record_wait(route, wait)
+                if reserved:
+                    break
+            response = None
+            started_at = monotonic()
+            try:
+                response = await self.request(method, url, headers, body)
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                if not self.api.should_retry(route, attempt, started_at):
+                    raise
+                self.logger.debug(f"{route} failed with {exception!r}, retrying")
+            else:
+                if not self.api.should_retry(
+                    route, attempt, started_at, response, body_size(body)
+                ):
+                    return response
+            if response is None or response.status_code != 429:
+                await asyncio.sleep(retry_policy.backoff(attempt))
+                # the request may have gone through even if no proper response came back
+                if retry_policy.needs_check(route):
+                    recovered = await self.recover_lost_post(endpoint)
+                    if recovered is not None:
+                        return recovered
+            attempt += 1
+            self.api.stats.record_retry(route)
+            # streamed bodies have to be sent from the start again
+            if body is not None and not isinstance(body, bytes):
+                body.seek(0)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        body: bytes | MultipartPageStream | None,
+    ) -> AsyncResponse:
+        # redirects are followed the way requests does it, so both clients end up at the same
+        # place: 303s, and 301/302 POSTs, become GETs without a body, and the token isn't
+        # sent along to another host
+        for _ in range(DEFAULT_REDIRECT_LIMIT + 1):
+            response = await self._pool(url).request(method, url, headers, body, self.api.TIMEOUT)
+            if (
+                response.status_code not in self.REDIRECT_CODES
+                or "location" not in response.headers
+            ):
+                return response
+            location = urljoin(url, response.headers["location"])
+            if (response.status_code in (302, 303) and method != "HEAD") or (
+                response.status_code == 301 and method == "POST"
+            ):
+                method = "GET"
+                body = None
+                headers = {
+                    name: value
+                    for name, value in headers.items()
+                    if name not in ("Content-Type", "Content-Length")
+                }
+            elif body is not None and not isinstance(body, bytes):
+                body.seek(0)
+            if urlsplit(location).hostname != urlsplit(url).hostname:
+                headers = {
+                    name: value for name, value in headers.items() if name != "Authorization"
+                }
+            self.logger.debug(f"{response.status_code} redirect from {url} to {location}")
+            url = location
+        raise requests.TooManyRedirects(f"Exceeded {DEFAULT_REDIRECT_LIMIT} redirects")
+
+    async def recover_lost_post(self, endpoint: str) -> dict | None:
+        # the upload session tells whether a begin/commit whose response was lost went through
+        session_id = await self.get_upload_session()
+        if endpoint == "upload/begin" and session_id not in (None, *self._open_sessions):
+            self.logger.debug(f"Lost upload/begin went through, using session {session_id}")
+            return {"result": "ok", "data": {"id": session_id}}
+        if endpoint.endswith("/commit") and session_id != endpoint.split("/")[1]:
+            self.logger.debug(f"Lost {endpoint} went through")
+            return {"result": "ok"}
+        return None
+
+    async def get_upload_session(self) -> str | None:
+        response = await self.send_request(
+            "get", "upload", on_error=MangaDexAPI.raise_on_error_bypass_404
+        )
+        if response["result"] == "ok":
+            self.logger.debug(f"Upload session ok: {response}")
+            return response["data"]["id"]
+        self.logger.debug(f"Upload session not ok (should be 404): {response}")
+
+    async def start_upload(
+        self, manga: str, groups: list[str], resumable: str | None = None
+    ) -> str:
+        old_session = await self.get_upload_session()
+        # session from an interrupted upload of the same chapter, its pages are still there
+        if old_session is not None and old_session == resumable:
+            self.logger.debug(f"Resuming upload session {old_session}")
+            self._open_sessions.add(old_session)
+            return old_session
+        # leftover session from a failed upload or another client
+        if old_session and old_session not in self._open_sessions:
+            await self.send_request("delete", f"upload/{old_session}")
+        response = await self.send_request(
+            "post", "upload/begin", json={"manga": manga, "groups": groups}
+        )
+        self._open_sessions.add(response["data"]["id"])
+        return response["data"]["id"]
+
+    async def upload_page(self, session_id: str, page: MultipartPageStream) -> str:
+        response = await self.send_request(
+            "post",
+            f"upload/{session_id}",
+            data=page,
+            headers={"Content-Type": page.content_type},
+        )
+        return response["data"][0]["id"]
+
+    async def upload_archive_page(
+        self, session_id: str, archive: ChapterArchive, page: str, journal_key: str
+    ) -> str:
+        with archive.page_stream(page) as page_stream:
+            page_id = await self.upload_page(session_id, page_stream)
+        await asyncio.to_thread(UploadJournal().add_page, journal_key, page, page_id)
+        return page_id
+
+    async def commit_upload(
+        self, session_id: str, chapter_draft: dict[str, str], page_order: list[str]
+    ) -> None:
+        await self.send_request(
+            "post",
+            f"upload/{session_id}/commit",
+            json={"chapterDraft": chapter_draft, "pageOrder": page_order},
+        )
+
+    async def upload_chapter(self, chapter: dict) -> None:
+        journal_key = UploadJournal.chapter_key(chapter)
+        if UploadJournal().is_committed(journal_key):
+            self.logger.info(
+                f"Skipped: chapter {chapter['chapter']} of {chapter['manga']}, "
+                f"{chapter.get('file')}, already uploaded in an interrupted run"
+            )
+            return
+        file = chapter.pop("file", None)
+        archive = await asyncio.to_thread(ChapterArchive, file) if file is not None else None
+        try:
+            pages = archive.pages if archive is not None else []
+            # chapters waiting for a free session slot already have their archive opened
+            async with self._upload_slots:
+                session_id = await self.start_upload(
+                    chapter.pop("manga"),
+                    chapter.pop("groups"),
+                    UploadJournal().session(journal_key),
+                )
+                try:
+                    await asyncio.to_thread(UploadJournal().start_session, journal_key, session_id)
+                    page_order = await self.upload_pages(session_id, archive, pages, journal_key)
+                    await self.commit_upload(session_id, chapter, page_order)
+                    await asyncio.to_thread(UploadJournal().commit, journal_key)
+                finally:
+                    self._open_sessions.discard(session_id)
+        finally:
+            if archive is not None:
+                await asyncio.to_thread(archive.close)
+
+    async def upload_pages(
+        self, session_id: str, archive: ChapterArchive | None, pages: list[str], journal_key: str
+    ) -> list[str]:
+        # pages that made it into this session before an interruption aren't uploaded again
+        uploaded = UploadJournal().uploaded_pages(journal_key, session_id)
+        if uploaded:
+            self.logger.debug(f"Reusing {len(uploaded)} pages from upload session {session_id}")
+        workers = asyncio.Semaphore(self.PAGE_UPLOAD_WORKERS)
+
+        async def upload(page: str) -> str:
+            if page in uploaded:
+                return uploaded[page]
+            async with workers:
+                return await self.upload_archive_page(session_id, archive, page, journal_key)
+
+        tasks = [asyncio.create_task(upload(page)) for page in pages]
+        try:
+            # gather keeps the ids in page order no matter which finishes first
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # don't keep uploading pages for a chapter that can't be committed anyway
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def get_cached_pages(
+        self, endpoint: str, params: dict, req_auth: bool = True
+    ) -> list[dict]:
+        cache = self.api.cache
+        cached = cache.get_query(endpoint, params)
+        if cached is not None and time() - cached[0] < cache.FRESH_FOR:
+            return cached[1]
+        fetched_at = time()
+        if cached is not None and endpoint in self.api.REVALIDATE_ENDPOINTS:
+            chapters = await self.revalidate_pages(endpoint, params, req_auth, *cached)
+        else:
+            chapters = await self.get_all_pages(endpoint, params, req_auth)
+        cache.put_query(endpoint, params, chapters, fetched_at)
+        return chapters
+
+    async def revalidate_pages(
+        self, endpoint: str, params: dict, req_auth: bool, fetched_at: float, chapters: list[dict]
+    ) -> list[dict]:
+        # same as MangaDexAPI.revalidate_pages, with the total and the changes fetched at once
+        first_page, updated = await asyncio.gather(
+            self.send_request(
+                "get", endpoint, req_auth, params=params | {"limit": 1, "offset": 0}
+            ),
+            self.get_all_pages(endpoint, self.api.updated_since(params, fetched_at), req_auth),
+        )
+        merged = self.api.merge_updated(chapters, updated, first_page["total"])
+        if merged is None:
+            return await self.get_all_pages(endpoint, params, req_auth)
+        return merged
+
+    async def get_all_pages(
+        self, endpoint: str, params: dict, req_auth: bool = True
+    ) -> list[dict]:
+        params = params | {"limit": 100, "offset": 0}
+        first_page = await self.send_request("get", endpoint, req_auth, params=params)
+        if first_page["total"] > self.api.MAX_OFFSET:
+            # partitioning/cursor walks are sequential round trips anyway, leave them to the
+            # sync client in a worker thread
+            return await asyncio.to_thread(
+                self.api.get_partitioned_pages, endpoint, params, req_auth, first_page
+            )
+        pages = await asyncio.gather(
+            *(
+                self.send_request("get", endpoint, req_auth, params=params | {"offset": offset})
+                for offset in range(100, first_page["total"], 100)
+            )
+        )
+        results = first_page["data"]
+        for page in pages:
+            results.extend(page["data"])
+        return results
+
+    async def get_chapter_list(self, filters: dict) -> list[dict]:
+        if all(value is None for value in filters.values()):
+            return []
+        plan = self.api.plan_chapter_query(filters)
+        results = await asyncio.gather(
+            *(self.get_cached_pages("chapter", params, req_auth=False) for params in plan.queries)
+        )
+        return plan.filter(list({chapter["id"]: chapter for chapter in chain(*results)}.values()))
+
+    async def edit_chapter(self, chapter: dict) -> None:
+        chapter.pop("manga")
+        chapter.pop("uploader", None)
+        chapter_id = chapter.pop("id")
+        await self.send_request("put", f"chapter/{chapter_id}", json=chapter)
+
+    async def delete_chapter(self, chapter_id: str) -> None:
+        await self.send_request("delete", f"chapter/{chapter_id}")
+
+    async def deactivate_chapter(self, chapter_id: str) -> None:
+        await self.send_request("delete", f"admin/chapter/{chapter_id}/activate")
+
+    async def reactivate_chapter(self, chapter_id: str) -> None:
+        await self.send_request("post", f"admin/chapter/{chapter_id}/activate")
+
+    async def restore_chapter(self, chapter_id: str) -> None:
+        await self.send_request("post", f"admin/chapter/{chapter_id}/restore")
+
+    async def edit_chapter_manga(self, chapter_id: str, manga_id: str) -> None:
+        await self.send_request(
+            "post", f"admin/chapter/{chapter_id}/move", json={"manga": manga_id}
+        )
+
+    async def edit_chapter_uploader(self, chapter_id: str, uploader_id: str) -> None:
+        await self.send_request(
+            "put", f"admin/chapter/{chapter_id}", json={"uploader": uploader_id}
+        )
@@ -0,0 +1,185 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from mangadex_mass_uploader.chapter_parser import Chapter, iter_chapters_for_restore
+from mangadex_mass_uploader.edit_backups import EditBackups
+from mangadex_mass_uploader.mangadex_api import MangaDexAPI
+
+logger = logging.getLogger("main")
+
+BULK_WORKERS = 5
+EDIT_WORKERS = 5
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def edit_chapter(label: str, old_chapter: Chapter, new_chapter: Chapter) -> bool:
+    """
+    Applies all the changes between two versions of a chapter, returns whether anything changed.
+    Each call bumps the chapter version, so they have to be sent in order.
+    """
+    changes = old_chapter.diff(new_chapter)
+    new_ch = new_chapter.copy()
+    moved = False
+    if "manga_id" in changes:
+        logger.info(f"{label} - title move: {old_chapter.id}")
+        MangaDexAPI().edit_chapter_manga(new_ch.id, new_ch.manga_id)
+        new_ch.version += 1
+        moved = True
+    if "uploader_id" in changes:
+        logger.info(f"{label} - uploader move: {old_chapter.id}")
+        MangaDexAPI().edit_chapter_uploader(new_ch.id, new_ch.uploader_id)
+        new_ch.version += 1
+        moved = True
+    # a move already brought the version up to date
+    changes -= {"manga_id", "uploader_id", "version"} if moved else {"manga_id", "uploader_id"}
+    if changes:
+        logger.info(f"{label} - chapter edit: {old_chapter.id}")
+        MangaDexAPI().edit_chapter(new_ch.to_api())
+        new_ch.version += 1
+    return new_ch.version != new_chapter.version
+
+
+def edit_chapters(
+    selected_chs: list[Chapter],
+    edited_chs: list[Chapter],
+    is_cancelled: Callable[[], bool],
+    workers: int = EDIT_WORKERS,
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Edits different chapters concurrently, returns the ids of the done, skipped and errored ones.
+    """
+    results, errored = run_bulk_action(
+        zip(selected_chs, edited_chs),
+        lambda label, chapters: edit_chapter(label, *chapters),
+        is_cancelled,
+        total=len(edited_chs),
+        workers=workers,
+    )
+    done = [old_chapter.id for (old_chapter, _), changed in results if changed]
+    skipped = [old_chapter.id for (old_chapter, _), changed in results if not changed]
+    return done, skipped, [old_chapter.id for old_chapter, _ in errored]
+
+
+def preview_restore(run_id: int, force: bool = False) -> dict[str, list[Chapter]]:
+    """
+    Dry run of restore_run, the chapters as they'd be restored grouped by their status.
+    """
+    statuses: dict[str, list[Chapter]] = {
+        "restore": [],
+        "unchanged": [],
+        "conflicted": [],
+        "missing": [],
+    }
+    for chunk in iter_chapters_for_restore(EditBackups().iter_run_chapters(run_id), force):
+        for status, _, restored in chunk:
+            statuses[status].append(restored)
+    return statuses
+
+
+def restore_run(
+    run_id: int,
+    is_cancelled: Callable[[], bool],
+    force: bool = False,
+    workers: int = EDIT_WORKERS,
+) -> dict[str, list[str]]:
+    """
+    Puts the chapters of a backed up run back how they were before it. Chapters are fetched and
+    restored in a stream, the restore is itself backed up as a new run as it goes.
+    Returns the ids of the done, skipped, errored, conflicted and missing chapters.
+    """
+    backups = EditBackups()
+    results: dict[str, list[str]] = {"conflicted": [], "missing": []}
+    skipped = []
+
+    def restorable_chapters() -> Iterator[tuple[Chapter, Chapter]]:
+        # the run is only created once there's something to restore, so restores that end up
+        # skipping everything don't leave an empty run behind
+        restore_run_id = None
+        for chunk in iter_chapters_for_restore(backups.iter_run_chapters(run_id), force):
+            for status, current, restored in chunk:
+                if status == "unchanged":
+                    skipped.append(restored.id)
+                elif status != "restore":
+                    logger.warning(f"Not restoring {status} chapter: {restored.id}")
+                    results[status].append(restored.id)
+            chapter_pairs = [
+                (current, restored) for status, current, restored in chunk if status == "restore"
+            ]
+            if not chapter_pairs:
+                continue
+            if restore_run_id is None:
+                restore_run_id = backups.start_run()
+                logger.info(f"Backup saved as run {restore_run_id}")
+            backups.add_chapters(restore_run_id, chapter_pairs)
+            yield from chapter_pairs
+
+    edited, errored = run_bulk_action(
+        restorable_chapters(),
+        lambda label, chapters: edit_chapter(label, *chapters),
+        is_cancelled,
+        workers=workers,
+    )
+    return {
+        "done": [current.id for (current, _), changed in edited if changed],
+        "skipped": skipped + [current.id for (current, _), changed in edited if not changed],
+        "errored": [current.id for current, _ in errored],
+        **results,
+    }
+
+
+def run_chapter_action(
+    chapters: list[Chapter],
+    action_name: str,
+    api_call: Callable[[str], None],
+    is_cancelled: Callable[[], bool],
+) -> tuple[list[str], list[str]]:
+    """
+    Calls api_call with each chapter id, returns the ids of the done and errored chapters.
+    """
+
+    def chapter_action(label: str, chapter: Chapter) -> None:
+        logger.info(f"{label} - chapter {action_name}: {chapter.id}")
+        api_call(chapter.id)
+
+    results, errored = run_bulk_action(chapters, chapter_action, is_cancelled, len(chapters))
+    return [chapter.id for chapter, _ in results], [chapter.id for chapter in errored]
+
+
+def run_bulk_action(
+    items: Iterable[T],
+    action: Callable[[str, T], R],
+    is_cancelled: Callable[[], bool],
+    total: int | None = None,
+    workers: int = BULK_WORKERS,
+) -> tuple[list[tuple[T, R]], list[T]]:
+    """
+    Runs action on every item with a pool of workers, and returns the (item, result) pairs that
+    succeeded and the items that errored. Items are only taken from the iterable as workers
+    free up, so at most one batch is still in flight after a cancel.
+    """
+    results = []
+    errored = []
+    pending: dict[Future, tuple[str, T]] = {}
+    queue = enumerate(items)
+    with ThreadPoolExecutor(workers) as executor:
+        while True:
+            while len(pending) < workers and not is_cancelled():
+                idx, item = next(queue, (None, None))
+                if idx is None:
+                    break
+                label = f"{idx + 1:>4}/{total:<4}" if total is not None else f"{idx + 1:>4}"
+                pending[executor.submit(action, label, item)] = (label, item)
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                label, item = pending.pop(future)
+                try:
+                    results.append((item, future.result()))
+                except Exception as exception:
+                    logger.error(f"{label} - {exception}")
+                    errored.append(item)
+    return results, errored
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Any, Hashable, Iterable
+
+
+class LRUCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class ChapterCache:
+    """
+    Chapters from the API keyed by id with the time they were fetched, and the ids returned by
+    each query keyed by its params.
+    Query results are served as they are while fresh, and revalidated by the caller after that
+    until they are too old to be trusted.
+    """
+
+    FRESH_FOR = 60
+    REVALIDATE_FOR = 15 * 60
+    MAX_CHAPTERS = 50_000
+    MAX_QUERIES = 32
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chapters = LRUCache(self.MAX_CHAPTERS)
+        self._queries = LRUCache(self.MAX_QUERIES)
+
+    @staticmethod
+    def query_key(endpoint: str, params: dict) -> tuple:
+        # filters come in as sets/lists in whatever order they were typed
+        normalized = []
+        for key, value in params.items():
+            if isinstance(value, (list, set, tuple)):
+                value = tuple(sorted(map(str, value)))
+            normalized.append((key, value))
+        return endpoint, tuple(sorted(normalized, key=lambda item: item[0]))
+
+    def get_query(self, endpoint: str, params: dict) -> tuple[float, list[dict]] | None:
+        key = self.query_key(endpoint, params)
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                return None
+            fetched_at, chapter_ids = entry
+            cached = [self._chapters.get(chapter_id) for chapter_id in chapter_ids]
+            # too old, or some of the chapters were evicted/edited since
+            if time() - fetched_at > self.REVALIDATE_FOR or None in cached:
+                self._queries.pop(key)
+                return None
+            return fetched_at, [chapter for _, chapter in cached]
+
+    def put_query(
+        self, endpoint: str, params: dict, chapters: list[dict], fetched_at: float
+    ) -> None:
+        self.put_chapters(chapters, fetched_at)
+        with self._lock:
+            self._queries.put(
+                self.query_key(endpoint, params),
+                (fetched_at, [chapter["id"] for chapter in chapters]),
+            )
+
+    def get_chapter(self, chapter_id: str) -> dict | None:
+        with self._lock:
+            cached = self._chapters.get(chapter_id)
+            return cached[1] if cached is not None else None
+
+    def get_fresh_chapters(self, chapter_ids: Iterable[str]) -> dict[str, dict]:
+        # same freshness as the queries, older chapters may have been edited by someone else
+        fresh_since = time() - self.FRESH_FOR
+        fresh = {}
+        with self._lock:
+            for chapter_id in chapter_ids:
+                cached = self._chapters.get(chapter_id)
+                if cached is not None and cached[0] >= fresh_since:
+                    fresh[chapter_id] = cached[1]
+        return fresh
+
+    def put_chapters(self, chapters: list[dict], fetched_at: float | None = None) -> None:
+        fetched_at = fetched_at or time()
+        with self._lock:
+            for chapter in chapters:
+                cached = self._chapters.get(chapter["id"])
+                # same version is the same chapter, keep the object that's already shared
+                if (
+                    cached is not None
+                    and cached[1]["attributes"]["version"] == chapter["attributes"]["version"]
+                ):
+                    chapter = cached[1]
+                self._chapters.put(chapter["id"], (fetched_at, chapter))
+
+    def invalidate(self, chapter_id: str | None = None) -> None:
+        # any write can change which chapters a query returns, so queries are always dropped
+        with self._lock:
+            self._queries.clear()
+            if chapter_id is not None:
+                self._chapters.pop(chapter_id)
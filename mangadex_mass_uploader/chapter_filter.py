@@ -0,0 +1,89 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable
+
+from natsort import natsorted
+
+NUMBER_PATTERN = re.compile(r"[0-9]+(\.[0-9]+)?")
+
+
+@lru_cache(maxsize=65536)
+def chapter_number(chapter: str) -> float | None:
+    # the first number in the chapter, so that "5.5" and "Extra 5.5" are both 5.5
+    match = NUMBER_PATTERN.search(chapter)
+    return float(match[0]) if match is not None else None
+
+
+class ChapterFilter:
+    """
+    Chapter number filter, compiled once from the entries typed in the chapter field.
+    Plain entries are matched exactly, ranges like "1-5" are turned into numeric intervals
+    that are merged and sorted, so each chapter is one set lookup plus one bisect no matter
+    how many ranges there are.
+    """
+
+    def __init__(self, entries: Iterable[str | None]):
+        self.exact: set[str | None] = set()
+        intervals: list[tuple[float, float, bool]] = []
+        for entry in entries:
+            try:
+                entry = re.sub(r"\s*", "", entry)
+                start, end = natsorted(range_element for range_element in entry.split("-", 1))
+            except (ValueError, TypeError):
+                self.exact.add(entry)
+                continue
+            interval = self.compile_range(start, end)
+            if interval is not None:
+                intervals.append(interval)
+        self.starts: list[float] = []
+        self.ends: list[tuple[float, bool]] = []
+        for start, end, end_inclusive in sorted(intervals):
+            # overlapping and touching intervals are merged, so they don't overlap anymore
+            if self.ends and start <= self.ends[-1][0]:
+                self.ends[-1] = max(self.ends[-1], (end, end_inclusive))
+                continue
+            self.starts.append(start)
+            self.ends.append((end, end_inclusive))
+
+    def compile_range(self, start: str, end: str) -> tuple[float, float, bool] | None:
+        # fallbacks for trailing -
+        if start == "":
+            self.exact.add(end)
+            return None
+        if end == "":
+            self.exact.add(start)
+            return None
+        # fallbacks for non-numerical bullshit
+        start_number = chapter_number(start)
+        end_number = chapter_number(end)
+        if start_number is None or end_number is None:
+            self.exact |= {start, end}
+            return None
+        # here we pretend that we don't know math for asdf, "1-5" includes 5.5
+        if "." not in NUMBER_PATTERN.search(end)[0]:
+            return start_number, end_number + 1, False
+        # real range check, just in case the user actually does the right thing
+        return start_number, end_number, True
+
+    @property
+    def values(self) -> set[str | None] | None:
+        # without ranges the filter can only ever match these exact chapters
+        return None if self.starts else self.exact
+
+    def __call__(self, chapter: str | None) -> bool:
+        if chapter in self.exact:
+            return True
+        if chapter is None or not self.starts:
+            return False
+        number = chapter_number(chapter)
+        if number is None:
+            return False
+        idx = bisect_right(self.starts, number) - 1
+        if idx < 0:
+            return False
+        end, end_inclusive = self.ends[idx]
+        return number < end or (end_inclusive and number == end)
+
+    def filter(self, chapters: list[dict]) -> list[dict]:
+        return [chapter for chapter in chapters if self(chapter["attributes"]["chapter"])]
@@ -1,22 +1,26 @@
 import dataclasses
-import functools
 import logging
 import os
-import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from itertools import zip_longest
-from typing import Callable, Iterable
+from itertools import chain, islice, zip_longest
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, TypeVar
 
-from natsort import natsorted
-from requests import HTTPError
 from typing_extensions import Self
 
-from mangadex_mass_uploader.mangadex_api import MangaDexAPI
+from mangadex_mass_uploader.chapter_filter import ChapterFilter
 
 logger = logging.getLogger("main")
 
+# chapters fetched at once for a restore, a few requests' worth that go out in parallel
+RESTORE_CHUNK_SIZE = 500
+RESTORE_IGNORED_FIELDS = {"version", "file"}
 
-@dataclass
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
 class Chapter:
     manga_id: str
     group_1_id: str | None
@@ -36,74 +40,105 @@ class Chapter:
 
     @property
     def groups(self) -> list[str]:
-        groups = [
-            self.group_1_id,
-            self.group_2_id,
-            self.group_3_id,
-            self.group_4_id,
-            self.group_5_id,
+        return [
+            group
+            for group in (
+                self.group_1_id,
+                self.group_2_id,
+                self.group_3_id,
+                self.group_4_id,
+                self.group_5_id,
+            )
+            if group is not None
         ]
-        return [group for group in groups if group is not None]
 
     def to_api(self) -> dict:
         ch_dict = {
-            "id": self.id,
-            "file": self.file,
             "manga": self.manga_id,
-            "uploader": self.uploader_id,
             "groups": self.groups,
             "volume": self.volume,
             "chapter": self.chapter,
             "title": self.title,
             "translatedLanguage": self.language,
-            "externalUrl": self.external_url,
-            "version": self.version,
         }
-        if self.external_url is None:
-            ch_dict.pop("externalUrl")
-        if self.file is None:
-            ch_dict.pop("file")
-        if self.id is None:
-            ch_dict.pop("id")
-        if self.version is None:
-            ch_dict.pop("version")
-        if self.uploader_id is None:
-            ch_dict.pop("uploader")
+        if self.id is not None:
+            ch_dict["id"] = self.id
+        if self.file is not None:
+            ch_dict["file"] = self.file
+        if self.uploader_id is not None:
+            ch_dict["uploader"] = self.uploader_id
+        if self.external_url is not None:
+            ch_dict["externalUrl"] = self.external_url
+        if self.version is not None:
+            ch_dict["version"] = self.version
         return ch_dict
 
     @classmethod
     def from_api(cls, chapter: dict) -> Self:
-        groups = [
-            relation["id"]
-            for relation in chapter["relationships"]
-            if relation["type"] == "scanlation_group"
-        ]
+        # a single pass over the relationships, they're the bulk of the chapter
+        manga_id = uploader_id = None
+        groups = []
+        for relation in chapter["relationships"]:
+            relation_type = relation["type"]
+            if relation_type == "scanlation_group":
+                groups.append(relation["id"])
+            elif relation_type == "manga":
+                manga_id = manga_id or relation["id"]
+            elif relation_type == "user":
+                uploader_id = uploader_id or relation["id"]
         groups += [None] * (5 - len(groups))
-        uploader_id = [
-            relation["id"] for relation in chapter["relationships"] if relation["type"] == "user"
-        ]
-        uploader_id = uploader_id[0] if len(uploader_id) != 0 else None
+        attributes = chapter["attributes"]
         return cls(
-            manga_id=[
-                relation["id"]
-                for relation in chapter["relationships"]
-                if relation["type"] == "manga"
-            ][0],
-            uploader_id=uploader_id,
-            group_1_id=groups[0],
-            group_2_id=groups[1],
-            group_3_id=groups[2],
-            group_4_id=groups[3],
-            group_5_id=groups[4],
-            id=chapter["id"],
-            volume=chapter["attributes"]["volume"],
-            chapter=chapter["attributes"]["chapter"],
-            title=chapter["attributes"]["title"],
-            language=chapter["attributes"]["translatedLanguage"],
-            version=chapter["attributes"]["version"],
-            external_url=chapter["attributes"]["externalUrl"],
+            manga_id,
+            groups[0],
+            groups[1],
+            groups[2],
+            groups[3],
+            groups[4],
+            attributes["volume"],
+            attributes["chapter"],
+            attributes["title"],
+            attributes["translatedLanguage"],
+            attributes["externalUrl"],
+            None,
+            chapter["id"],
+            attributes["version"],
+            uploader_id,
         )
 
+    def copy(self, **changes) -> Self:
+        """
+        Much cheaper than dataclasses.replace, which goes through the fields on every call.
+        """
+        chapter = Chapter(*chapter_values(self))
+        for field_name, value in changes.items():
+            setattr(chapter, field_name, value)
+        return chapter
+
+    def diff(self, other: Self) -> set[str]:
+        """
+        Names of the fields that differ between the two chapters.
+        """
+        values = chapter_values(self)
+        other_values = chapter_values(other)
+        # most chapters of an edit are left as they were
+        if values == other_values:
+            return set()
+        return {
+            field_name
+            for field_name, value, other_value in zip(FIELD_NAMES, values, other_values)
+            if value != other_value
+        }
+
+    def __reduce__(self):
+        # just the values in field order, the field names aren't repeated for every chapter
+        return Chapter, chapter_values(self)
+
+    def __setstate__(self, state: dict):
+        # backups from before the slots
+        for field_name, value in state.items():
+            setattr(self, field_name, value)
+
     def __repr__(self):
         ch_repr = f"--------------------------------------\n"
         if self.id is not None:
@@ -125,6 +160,10 @@ class Chapter:
         return ch_repr
 
 
+FIELD_NAMES: tuple[str, ...] = tuple(field.name for field in dataclasses.fields(Chapter))
+chapter_values = attrgetter(*FIELD_NAMES)
+
+
 def split_inputs(inputs: Iterable) -> dict[str, list[str]]:
     inputs_dict = {}
     for field_id, element in inputs:
@@ -160,7 +199,7 @@ def parse_upload_input(text_inputs: Iterable, files: list[str]) -> list[Chapter]
     ]
 
 
-def parse_edit_filters(text_inputs: Iterable) -> dict[str, None | set[None | str | dict]]:
+def parse_edit_filters(text_inputs: Iterable) -> dict[str, None | set[None | str] | ChapterFilter]:
     filters = {}
     for field_id, element in text_inputs:
         split_values = element.text.split("\n")
@@ -169,89 +208,88 @@ def parse_edit_filters(text_inputs: Iterable) -> dict[str, None | set[None | str
             continue
         filters[field_id] = {None if value == "" else value for value in split_values}
         if field_id == "chapter numbers":
-            filters[field_id] = parse_range_filters(filters[field_id])
+            filters[field_id] = ChapterFilter(filters[field_id])
     return filters
 
 
-def parse_range_filters(filter_set: set[None | str]) -> dict[str, set[None | str | Callable]]:
-    normal_filters = set()
-    range_filters = set()
-    for entry in filter_set:
-        try:
-            entry = re.sub(r"\s*", "", entry)
-            start, end = natsorted(range_element for range_element in entry.split("-", 1))
-            range_filters |= {functools.partial(is_in_range, start, end)}
-        except (ValueError, TypeError):
-            normal_filters |= {entry}
-    return {"normal_filters": normal_filters, "range_filters": range_filters}
-
-
-def is_in_range(start: str, end: str, chapter: None | str) -> bool:
-    if chapter is None:
-        return False
-    # fallbacks for trailing -
-    if start == "":
-        return chapter == end
-    if end == "":
-        return chapter == start
-    # fallbacks for non-numerical bullshit
-    num_pattern = r"[0-9]+(\.[0-9]+)?"
-    chapter_match = re.search(num_pattern, chapter)
-    start_match = re.search(num_pattern, start)
-    end_match = re.search(num_pattern, end)
-    if any([chapter_match is None, start_match is None, end_match is None]):
-        return chapter == start or chapter == end
-    # here we pretend that we don't know math for asdf
-    if "." not in end_match[0]:
-        return float(start_match[0]) <= float(chapter_match[0]) < int(end_match[0]) + 1
-    # real range check, just in case the user actually does the right thing
-    return float(start_match[0]) <= float(chapter_match[0]) <= float(end_match[0])
+def fetch_from_api(method_name: str, *args) -> list[Chapter]:
+    # the api client, and requests with it, are only loaded once something is actually fetched
+    from requests import HTTPError
 
+    from mangadex_mass_uploader.mangadex_api import MangaDexAPI
 
-def fetch_chapters(text_inputs: Iterable) -> list[Chapter]:
-    filters = parse_edit_filters(text_inputs)
     try:
-        chapters = MangaDexAPI().get_chapter_list(filters)
+        chapters = getattr(MangaDexAPI(), method_name)(*args)
     except HTTPError:
         logger.exception(f"Could not get chapters from the API")
         return []
     return [Chapter.from_api(chapter) for chapter in chapters]
 
 
+def fetch_chapters(text_inputs: Iterable) -> list[Chapter]:
+    return fetch_from_api("get_chapter_list", parse_edit_filters(text_inputs))
+
+
 def fetch_unavailable_chapters(text_inputs: Iterable) -> list[Chapter]:
-    filters = parse_edit_filters(text_inputs)
-    try:
-        chapters = MangaDexAPI().get_unavailable_chapter_list(filters)
-    except HTTPError:
-        logger.exception(f"Could not get chapters from the API")
-        return []
-    return [Chapter.from_api(chapter) for chapter in chapters]
+    return fetch_from_api("get_unavailable_chapter_list", parse_edit_filters(text_inputs))
 
 
-def fetch_chapters_from_ids(chapter_ids: list[str]) -> list[Chapter]:
-    try:
-        chapters = MangaDexAPI().get_chapters_by_id(chapter_ids)
-    except HTTPError:
-        logger.exception(f"Could not get chapters from the API")
-        return []
-    return [Chapter.from_api(chapter) for chapter in chapters]
+def fetch_chapters_from_ids(
+    chapter_ids: list[str], include_unavailable: bool = False
+) -> list[Chapter]:
+    return fetch_from_api("get_chapters_by_id", chapter_ids, include_unavailable)
+
 
+def chunked(items: Iterable[T], chunk_size: int) -> Iterator[list[T]]:
+    items = iter(items)
+    while chunk := list(islice(items, chunk_size)):
+        yield chunk
 
-def prepare_chapters_for_restore(chapters: list[Chapter]) -> tuple[list[Chapter], list[Chapter]]:
-    # fetch current version of chapts from API and match to restored versions by id
-    chapt_dict = {chapt.id: {"restored": chapt} for chapt in chapters}
-    fetched_chapts = fetch_chapters_from_ids([chapt_id for chapt_id in chapt_dict])
-    for chapt in fetched_chapts:
-        chapt_dict[chapt.id]["current"] = chapt
-    restored_chapts = []
-    current_chapts = []
-    for chapt_pair in chapt_dict.values():
+
+def match_restore_chunk(
+    chunk: list[tuple[Chapter, Chapter]], current_chapts: list[Chapter], force: bool
+) -> list[tuple[str, Chapter | None, Chapter]]:
+    current_by_id = {chapt.id: chapt for chapt in current_chapts}
+    matched = []
+    for before, after in chunk:
+        current = current_by_id.get(before.id)
         # chapter deleted/disabled/failed to fetch, can't restore
-        if "current" not in chapt_pair:
+        if current is None:
+            matched.append(("missing", None, before))
             continue
-        restored_chapts.append(chapt_pair["restored"])
-        current_chapts.append(chapt_pair["current"])
-    return restored_chapts, current_chapts
+        restored = before.copy(version=current.version, file=None)
+        # versions always go up with the edit, and files aren't part of a chapter on the API
+        if not current.diff(before) - RESTORE_IGNORED_FIELDS:
+            matched.append(("unchanged", current, restored))
+        elif not current.diff(after) - RESTORE_IGNORED_FIELDS or force:
+            matched.append(("restore", current, restored))
+        else:
+            # edited again after the backup, restoring would undo that edit as well
+            matched.append(("conflicted", current, restored))
+    return matched
+
+
+def iter_chapters_for_restore(
+    backed_up_chapts: Iterable[tuple[Chapter, Chapter]],
+    force: bool = False,
+    chunk_size: int = RESTORE_CHUNK_SIZE,
+) -> Iterator[list[tuple[str, Chapter | None, Chapter]]]:
+    """
+    Matches the (before, after) chapters of a backup to their current versions, a chunk at a
+    time. Yields (status, current, restored) for every chapter, where the status is "restore",
+    "unchanged", "conflicted" (changed again since the backup, restored anyway if forced) or
+    "missing". The next chunk is fetched while the caller restores the current one.
+    """
+    pending = None
+    with ThreadPoolExecutor(1) as executor:
+        for chunk in chain(chunked(backed_up_chapts, chunk_size), [None]):
+            fetched = pending
+            if chunk is not None:
+                chapter_ids = [before.id for before, _ in chunk]
+                pending = chunk, executor.submit(fetch_chapters_from_ids, chapter_ids)
+            if fetched is not None:
+                fetched_chunk, current_chapts = fetched
+                yield match_restore_chunk(fetched_chunk, current_chapts.result(), force)
 
 
 def parse_edit_inputs(
@@ -299,12 +337,7 @@ def parse_conditional_volumes(text_input: list[str]) -> list[dict[str, str | Cal
         else:
             parsed_entry["new_value"] = parsed_entry["new_value"].strip()
 
-        ch_filter = re.sub(r"\s*", "", ch_filter)
-        try:
-            start, end = natsorted(range_element for range_element in ch_filter.split("-", 1))
-            parsed_entry["filter"] = functools.partial(is_in_range, start, end)
-        except ValueError:
-            parsed_entry["filter"] = lambda chapter: chapter == ch_filter
+        parsed_entry["filter"] = ChapterFilter([ch_filter])
         parsed_input.append(parsed_entry)
     return parsed_input
 
@@ -327,7 +360,7 @@ def parse_edits(selected_chapters: list[Chapter], text_inputs: Iterable) -> list
             else:
                 new_value = new_value.strip()
             new_values[field] = new_value
-        edited_chapter = dataclasses.replace(chapter, **new_values)
+        edited_chapter = chapter.copy(**new_values)
         # apply conditional vol changes
         for entry in cond_vols:
             if not entry["filter"](chapter.chapter):
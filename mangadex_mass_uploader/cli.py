@@ -0,0 +1,343 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import signal
+import sys
+from typing import Callable, Iterable
+
+from mangadex_mass_uploader.app_home import init_app_home
+from mangadex_mass_uploader.async_api import AsyncMangaDexAPI
+from mangadex_mass_uploader.bulk_actions import edit_chapters, restore_run, run_chapter_action
+from mangadex_mass_uploader.chapter_parser import (
+    Chapter,
+    fetch_chapters,
+    fetch_chapters_from_ids,
+    fetch_unavailable_chapters,
+    iter_chapters_for_restore,
+    parse_edits,
+    parse_upload_input,
+)
+from mangadex_mass_uploader.edit_backups import EditBackups
+from mangadex_mass_uploader.mangadex_api import MangaDexAPI
+from mangadex_mass_uploader.upload_scheduler import upload_chapters
+
+logger = logging.getLogger("main")
+
+UPLOAD_FIELDS = (
+    "manga_id",
+    "volume",
+    "chapter",
+    "title",
+    "language",
+    "group_1_id",
+    "group_2_id",
+    "group_3_id",
+    "group_4_id",
+    "group_5_id",
+    "external_url",
+)
+EDIT_FIELDS = (
+    "volume",
+    "chapter",
+    "title",
+    "language",
+    "groups",
+    "manga_id",
+    "uploader_id",
+    "external_url",
+)
+# manifest filter names, and the field ids they have on the selection and reactivation screens
+SELECTION_FILTERS = {
+    "manga": "manga",
+    "uploader": "uploader",
+    "groups": "groups[]",
+    "languages": "translatedLanguage[]",
+    "volumes": "volume[]",
+    "chapters": "chapter numbers",
+}
+UNAVAILABLE_FILTERS = {
+    "manga": "manga",
+    "uploader": "uploader",
+    "groups": "group",
+    "languages": "translatedLanguage",
+    "volumes": "volume[]",
+    "chapters": "chapter numbers",
+}
+CHAPTER_ACTIONS = {
+    "delete": (lambda: MangaDexAPI().delete_chapter, False),
+    "deactivate": (lambda: MangaDexAPI().deactivate_chapter, False),
+    "reactivate": (lambda: MangaDexAPI().reactivate_chapter, True),
+    "restore": (lambda: MangaDexAPI().restore_chapter, True),
+}
+ACTIONS = ("upload", "edit", "undo", *CHAPTER_ACTIONS)
+
+
+class ManifestField:
+    """
+    Stands in for a ChapterInfoInput, the parsers only ever read the text of the inputs.
+    Lists are one value per line, same as typing them into the GUI.
+    """
+
+    def __init__(self, value: str | int | float | list | None):
+        if isinstance(value, list):
+            value = "\n".join("" if line is None else str(line) for line in value)
+        self.text = "" if value is None else str(value)
+
+
+def manifest_inputs(values: dict, field_ids: Iterable[str]) -> list[tuple[str, ManifestField]]:
+    return [(field_id, ManifestField(values.get(field_id))) for field_id in field_ids]
+
+
+def load_manifest(path: str) -> dict:
+    """
+    CSV manifests are one chapter per row. JSON and YAML manifests are either a list of
+    chapters, or a dict with "chapters", or with "filters" and "edits".
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if extension == ".csv":
+            manifest = list(csv.DictReader(file))
+        elif extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError as err:
+                raise SystemExit(
+                    "YAML manifests need PyYAML installed, use JSON or CSV instead"
+                ) from err
+            manifest = yaml.safe_load(file)
+        else:
+            manifest = json.load(file)
+    if isinstance(manifest, list):
+        manifest = {"chapters": manifest}
+    # files are relative to the manifest, so a job folder can be moved around as a whole
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for chapter in manifest.get("chapters", []):
+        if chapter.get("file"):
+            chapter["file"] = os.path.join(base_dir, os.path.expanduser(chapter["file"]))
+    return manifest
+
+
+def chapters_to_upload(manifest: dict) -> list[Chapter]:
+    rows = manifest.get("chapters", [])
+    for row in rows:
+        # groups can also be given as a single list/comma separated field
+        groups = row.pop("groups", None) or []
+        if isinstance(groups, str):
+            groups = [group.strip() for group in groups.split(",")]
+        for idx, group in enumerate(groups[:5]):
+            row.setdefault(f"group_{idx + 1}_id", group)
+    columns = {field_id: [row.get(field_id) for row in rows] for field_id in UPLOAD_FIELDS}
+    files = [row.get("file") or None for row in rows]
+    return parse_upload_input(manifest_inputs(columns, UPLOAD_FIELDS), files)
+
+
+def select_chapters(manifest: dict, unavailable: bool = False) -> list[Chapter]:
+    if manifest.get("chapters"):
+        chapter_ids = [row.get("id") for row in manifest["chapters"]]
+        if None in chapter_ids:
+            raise SystemExit("Every chapter in the manifest needs an id to be selected")
+        # the chapters to reactivate/restore are deactivated/deleted, so they're unavailable
+        return fetch_chapters_from_ids(chapter_ids, unavailable)
+    filter_names = UNAVAILABLE_FILTERS if unavailable else SELECTION_FILTERS
+    filters = {
+        field_id: manifest.get("filters", {}).get(name) for name, field_id in filter_names.items()
+    }
+    text_inputs = manifest_inputs(filters, filters.keys())
+    if unavailable:
+        return fetch_unavailable_chapters(text_inputs)
+    return fetch_chapters(text_inputs)
+
+
+def chapters_to_edit(manifest: dict, selected_chapters: list[Chapter]) -> list[Chapter]:
+    if manifest.get("chapters"):
+        # per chapter rows, lined up with the selected chapters by id
+        rows = {row["id"]: row for row in manifest["chapters"]}
+        edits = {
+            field_id: [rows[chapter.id].get(field_id) for chapter in selected_chapters]
+            for field_id in EDIT_FIELDS
+        }
+        edits["groups"] = [
+            ",".join(groups) if isinstance(groups, list) else groups for groups in edits["groups"]
+        ]
+        # an extra empty line, so that a single chapter's edits aren't repeated
+        for values in edits.values():
+            values.append(None)
+    else:
+        edits = manifest.get("edits", {})
+        # groups are comma separated, a list of lists gives each chapter its own groups
+        if isinstance(edits.get("groups"), list):
+            if any(isinstance(groups, list) for groups in edits["groups"]):
+                edits["groups"] = [
+                    ",".join(groups) if isinstance(groups, list) else groups
+                    for groups in edits["groups"]
+                ]
+            else:
+                edits["groups"] = ",".join(edits["groups"])
+    return parse_edits(selected_chapters, manifest_inputs(edits, EDIT_FIELDS))
+
+
+def log_results(**results: list) -> None:
+    for name, ids in results.items():
+        logger.info(f"{name.capitalize()}: {len(ids)}")
+    for name, ids in results.items():
+        logger.debug(f"{name.capitalize()}: {ids}")
+
+
+def run_upload(manifest: dict, dry_run: bool, is_cancelled: Callable[[], bool]) -> bool:
+    chapters = chapters_to_upload(manifest)
+    if dry_run:
+        print("".join(map(str, chapters)) or "No chapters selected.")
+        return True
+    failed = upload_chapters(chapters, is_cancelled)
+    logger.info(f"Failed: {len(failed)}")
+    logger.debug(f"Failed: {[chapter.file for chapter in failed]}")
+    logger.debug(f"Connections: {AsyncMangaDexAPI().connection_stats}")
+    return not failed and not is_cancelled()
+
+
+def run_edit(manifest: dict, dry_run: bool, is_cancelled: Callable[[], bool]) -> bool:
+    selected_chapters = select_chapters(manifest)
+    edited_chapters = chapters_to_edit(manifest, selected_chapters)
+    if dry_run:
+        print("".join(map(str, edited_chapters)) or "No chapters selected.")
+        return True
+    run_id = EditBackups().add_run(selected_chapters, edited_chapters)
+    logger.info(f"Backup saved as run {run_id}")
+    done, skipped, errored = edit_chapters(selected_chapters, edited_chapters, is_cancelled)
+    log_results(done=done, skipped=skipped, errored=errored)
+    return not errored and not is_cancelled()
+
+
+def run_undo(run_id: int, dry_run: bool, force: bool, is_cancelled: Callable[[], bool]) -> bool:
+    backups = EditBackups()
+    backups.import_legacy_backups()
+    if not backups.has_run(run_id):
+        raise SystemExit(f"There is no backup of run {run_id}")
+    if dry_run:
+        for chunk in iter_chapters_for_restore(backups.iter_run_chapters(run_id), force):
+            for status, _, restored in chunk:
+                print(f"{status}: {restored}", end="")
+        return True
+    results = restore_run(run_id, is_cancelled, force)
+    log_results(**results)
+    return not results["errored"] and not results["conflicted"] and not is_cancelled()
+
+
+def run_chapter_actions(
+    action_name: str, manifest: dict, dry_run: bool, is_cancelled: Callable[[], bool]
+) -> bool:
+    api_call, unavailable = CHAPTER_ACTIONS[action_name]
+    chapters = select_chapters(manifest, unavailable)
+    if dry_run:
+        print("".join(map(str, chapters)) or "No chapters selected.")
+        return True
+    done, errored = run_chapter_action(chapters, action_name, api_call(), is_cancelled)
+    log_results(done=done, errored=errored)
+    return not errored and not is_cancelled()
+
+
+def login(saved_login: str | None) -> None:
+    if saved_login is not None:
+        MangaDexAPI().load_login(saved_login)
+        return
+    try:
+        MangaDexAPI().login(
+            os.environ["MD_USERNAME"],
+            os.environ["MD_PASSWORD"],
+            os.environ["MD_CLIENT_ID"],
+            os.environ["MD_CLIENT_SECRET"],
+            False,
+        )
+    except KeyError as missing:
+        raise SystemExit(
+            f"Either use --login or set {missing.args[0]} in the environment"
+        ) from missing
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="mass-uploader-cli",
+        description="Run mass uploads, edits and chapter actions from a manifest, "
+        "without the GUI.",
+    )
+    parser.add_argument("action", choices=ACTIONS, help="what to do with the chapters")
+    parser.add_argument(
+        "manifest",
+        help="CSV, JSON or YAML file with the chapters/filters, or the backup run number to undo",
+    )
+    parser.add_argument(
+        "--login",
+        metavar="NAME",
+        help="saved login from the GUI, otherwise MD_USERNAME, MD_PASSWORD, MD_CLIENT_ID and "
+        "MD_CLIENT_SECRET are used",
+    )
+    parser.add_argument(
+        "--home",
+        help="folder for logins, backups and the upload journal, give each parallel job its "
+        "own one. defaults to the GUI's",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the chapters and exit without any changes"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="undo chapters even if they were edited again after the run",
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help="save the request stats of the run, in Prometheus' text format if FILE ends in "
+        ".prom, json otherwise",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging")
+    return parser.parse_args(args)
+
+
+def run_action(args: argparse.Namespace, is_cancelled: Callable[[], bool]) -> bool:
+    if args.action == "undo":
+        login(args.login)
+        try:
+            run_id = int(args.manifest)
+        except ValueError as err:
+            raise SystemExit("undo takes the run number of an edit backup") from err
+        return run_undo(run_id, args.dry_run, args.force, is_cancelled)
+    manifest = load_manifest(args.manifest)
+    if not args.dry_run or args.action != "upload":
+        login(args.login)
+    if args.action == "upload":
+        return run_upload(manifest, args.dry_run, is_cancelled)
+    if args.action == "edit":
+        return run_edit(manifest, args.dry_run, is_cancelled)
+    return run_chapter_actions(args.action, manifest, args.dry_run, is_cancelled)
+
+
+def main(args: list[str] | None = None) -> int:
+    args = parse_args(args)
+    init_app_home(args.home)
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(message)s",
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        stream=sys.stderr,
+    )
+    # first ^C lets the chapters in flight finish, same as the GUI's cancel button
+    cancelled = []
+
+    def cancel(*_):
+        if cancelled:
+            raise KeyboardInterrupt
+        logger.warning("Cancelling after the chapters in flight, ^C again to abort")
+        cancelled.append(True)
+
+    signal.signal(signal.SIGINT, cancel)
+    with MangaDexAPI().stats.run(args.action) as run_stats:
+        succeeded = run_action(args, lambda: bool(cancelled))
+        if args.stats is not None:
+            run_stats.save(args.stats)
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
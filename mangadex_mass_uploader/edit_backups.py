@@ -0,0 +1,199 @@
+import glob
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from mangadex_mass_uploader.chapter_parser import Chapter, chapter_values
+from mangadex_mass_uploader.utils import Singleton
+
+logger = logging.getLogger("main")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    chapter_count INTEGER NOT NULL,
+    manga_count INTEGER NOT NULL,
+    source TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    position INTEGER NOT NULL,
+    chapter_id TEXT NOT NULL,
+    manga_id TEXT,
+    old TEXT NOT NULL,
+    new TEXT NOT NULL,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS chapters_by_chapter ON chapters(chapter_id, run_id);
+CREATE INDEX IF NOT EXISTS chapters_by_manga ON chapters(manga_id, run_id);
+"""
+
+
+class LegacyBackupUnpickler(pickle.Unpickler):
+    # the old backups are only ever lists of chapters, anything else in them is refused
+    def find_class(self, module: str, name: str):
+        if (module, name) == ("mangadex_mass_uploader.chapter_parser", "Chapter"):
+            return Chapter
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed in a backup")
+
+
+class EditBackups(metaclass=Singleton):
+    """
+    Append-only store of the chapters before and after every mass edit, one run per edit.
+    Chapters are kept as json lists of their values, indexed by chapter and manga id, so a
+    single run or the history of a chapter can be loaded without reading all of them.
+    """
+
+    def __init__(self):
+        self.path = f"{os.environ['KIVY_HOME']}/edits/backups.sqlite3"
+        self._lock = threading.Lock()
+        with closing(self._connect()) as db:
+            # restores read a run while they write the next one
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def dump_chapter(chapter: Chapter) -> str:
+        return json.dumps(chapter_values(chapter), separators=(",", ":"))
+
+    @staticmethod
+    def load_chapter(values: str) -> Chapter:
+        return Chapter(*json.loads(values))
+
+    def start_run(self, started_at: datetime | None = None, source: str | None = None) -> int:
+        started_at = started_at or datetime.now()
+        with self._lock, closing(self._connect()) as db, db:
+            return db.execute(
+                "INSERT INTO runs (started_at, chapter_count, manga_count, source) "
+                "VALUES (?, 0, 0, ?)",
+                (started_at.isoformat(timespec="seconds"), source),
+            ).lastrowid
+
+    def add_chapters(self, run_id: int, chapter_pairs: Iterable[tuple[Chapter, Chapter]]) -> None:
+        """
+        Appends (old, new) chapters to a run, runs that stream their chapters add them in chunks.
+        """
+        with self._lock, closing(self._connect()) as db, db:
+            (first_position,) = db.execute(
+                "SELECT chapter_count FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()
+            rows = [
+                (
+                    run_id,
+                    position,
+                    old_ch.id,
+                    old_ch.manga_id,
+                    self.dump_chapter(old_ch),
+                    self.dump_chapter(new_ch),
+                )
+                for position, (old_ch, new_ch) in enumerate(chapter_pairs, first_position)
+            ]
+            db.executemany(
+                "INSERT INTO chapters (run_id, position, chapter_id, manga_id, old, new) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute(
+                "UPDATE runs SET chapter_count = ?, manga_count = "
+                "(SELECT COUNT(DISTINCT manga_id) FROM chapters WHERE run_id = ?) WHERE id = ?",
+                (first_position + len(rows), run_id, run_id),
+            )
+
+    def add_run(
+        self,
+        selected_chs: list[Chapter],
+        edited_chs: list[Chapter],
+        started_at: datetime | None = None,
+        source: str | None = None,
+    ) -> int:
+        run_id = self.start_run(started_at, source)
+        self.add_chapters(run_id, zip(selected_chs, edited_chs))
+        return run_id
+
+    def runs(self, search: str | None = None, limit: int = 200) -> list[dict]:
+        """
+        Latest runs first. With a search, only the runs that touched that chapter or manga id.
+        """
+        query = "SELECT id, started_at, chapter_count, manga_count FROM runs"
+        params: tuple = ()
+        if search:
+            query += (
+                " WHERE id IN (SELECT run_id FROM chapters WHERE chapter_id = ?"
+                " UNION SELECT run_id FROM chapters WHERE manga_id = ?)"
+            )
+            params = (search, search)
+        query += " ORDER BY id DESC LIMIT ?"
+        with closing(self._connect()) as db:
+            rows = db.execute(query, (*params, limit)).fetchall()
+        return [
+            {"id": row[0], "started_at": row[1], "chapter_count": row[2], "manga_count": row[3]}
+            for row in rows
+        ]
+
+    def has_run(self, run_id: int) -> bool:
+        with closing(self._connect()) as db:
+            return db.execute("SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone() is not None
+
+    def run_chapters(self, run_id: int) -> tuple[list[Chapter], list[Chapter]]:
+        """
+        The chapters of a run as they were before and after it, in the order they were edited.
+        """
+        chapter_pairs = list(self.iter_run_chapters(run_id))
+        return [old for old, _ in chapter_pairs], [new for _, new in chapter_pairs]
+
+    def iter_run_chapters(self, run_id: int) -> Iterator[tuple[Chapter, Chapter]]:
+        # rows are read from the cursor as they're used, so large runs aren't loaded at once
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT old, new FROM chapters WHERE run_id = ? ORDER BY position", (run_id,)
+            )
+            for old, new in rows:
+                yield self.load_chapter(old), self.load_chapter(new)
+
+    def chapter_history(self, chapter_id: str) -> list[tuple[int, Chapter, Chapter]]:
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT run_id, old, new FROM chapters WHERE chapter_id = ? ORDER BY run_id",
+                (chapter_id,),
+            ).fetchall()
+        return [
+            (run_id, self.load_chapter(old), self.load_chapter(new)) for run_id, old, new in rows
+        ]
+
+    def import_legacy_backups(self) -> None:
+        """
+        One-time migration of the .pickle files from older versions, which are left where they
+        were. Can take a while the first time, the GUI runs it in a background thread.
+        """
+        with closing(self._connect()) as db:
+            imported = {row[0] for row in db.execute("SELECT source FROM runs")}
+        import_count = 0
+        for path in sorted(glob.glob(f"{os.environ['KIVY_HOME']}/edits/*.pickle")):
+            source = os.path.basename(path)
+            if source in imported:
+                continue
+            try:
+                with open(path, "rb") as file:
+                    backup = LegacyBackupUnpickler(file).load()
+                started_at = datetime.strptime(source, "%Y-%m-%dT%H-%M-%S.pickle")
+            except Exception as exception:
+                logger.warning(f"Could not import the edit backup {source}: {exception}")
+                continue
+            try:
+                self.add_run(backup["old"], backup["new"], started_at, source)
+            except sqlite3.IntegrityError:
+                # imported by another instance of the app in the meantime
+                continue
+            import_count += 1
+        if import_count:
+            logger.info(f"Imported {import_count} edit backups")
@@ -1,7 +1,10 @@
 import os
 import sys
 
-os.environ["KIVY_HOME"] = os.path.expanduser("~/.md_mass_uploader")
+from mangadex_mass_uploader.app_home import init_app_home
+
+# first time init, KIVY_HOME has to be set before kivy is imported
+init_app_home()
 if hasattr(sys, "_MEIPASS"):
     os.environ["KIVY_NO_CONSOLELOG"] = "1"
 
@@ -11,10 +14,6 @@ from kivy.resources import resource_add_path
 if hasattr(sys, "_MEIPASS"):
     resource_add_path(os.path.join(sys._MEIPASS))
 
-# first time init
-os.makedirs(f"{os.environ['KIVY_HOME']}/logins", exist_ok=True)
-os.makedirs(f"{os.environ['KIVY_HOME']}/edits", exist_ok=True)
-os.makedirs(f"{os.environ['KIVY_HOME']}/edit_logs", exist_ok=True)
 if not Config.get("mass_uploader", "initialized", fallback=False):
     if "mass_uploader" not in Config.sections():
         Config.add_section("mass_uploader")
@@ -2,9 +2,11 @@ import mangadex_mass_uploader.kivy_config
 
 from kivy.app import App
 
+from mangadex_mass_uploader.edit_backups import EditBackups
 from mangadex_mass_uploader.mass_editor import EditModificationScreen, EditSelectionScreen
 from mangadex_mass_uploader.mass_reactivator import ReactivationScreen
 from mangadex_mass_uploader.mass_uploader import UploaderScreen
+from mangadex_mass_uploader.utils import threaded
 from mangadex_mass_uploader.widgets.log_output import LogOutput
 from mangadex_mass_uploader.widgets.login_screen import LoginScreen
 
@@ -14,6 +16,10 @@ class MainApp(App):
         super().build()
         self.icon = "../assets/mass_uploader.ico"
 
+    def on_start(self):
+        # not a daemon thread, so closing the app doesn't cut an import short
+        threaded(EditBackups().import_legacy_backups)()
+
 
 def main():
     MainApp().run()
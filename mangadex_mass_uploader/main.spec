@@ -17,7 +17,14 @@ a = Analysis(
         ("../assets/mass_uploader.ico", "./assets/"),
         ("../assets/mass_uploader.png", "./assets/"),
         ("../assets/NotoSansJP-Regular.ttf", "./assets/"),
+        ("app_home.py", "./"),
+        ("async_api.py", "./"),
+        ("bulk_actions.py", "./"),
+        ("chapter_cache.py", "./"),
+        ("chapter_filter.py", "./"),
         ("chapter_parser.py", "./"),
+        ("cli.py", "./"),
+        ("edit_backups.py", "./"),
         ("kivy_config.py", "./"),
         ("main.kv", "./"),
         ("mangadex_api.py", "./"),
@@ -27,8 +34,18 @@ a = Analysis(
         ("mass_reactivator.kv", "./"),
         ("mass_uploader.py", "./"),
         ("mass_uploader.kv", "./"),
+        ("page_stream.py", "./"),
+        ("preview_renderer.py", "./"),
+        ("query_planner.py", "./"),
+        ("rate_limiter.py", "./"),
+        ("request_stats.py", "./"),
+        ("retry_policy.py", "./"),
+        ("upload_journal.py", "./"),
+        ("upload_scheduler.py", "./"),
         ("utils.py", "./"),
         ("widgets/app_screen.py", "./widgets"),
+        ("widgets/backup_chooser.py", "./widgets"),
+        ("widgets/backup_chooser.kv", "./widgets"),
         ("widgets/chapter_info_input.py", "./widgets"),
         ("widgets/chapter_info_input.kv", "./widgets"),
         ("widgets/log_output.py", "./widgets"),
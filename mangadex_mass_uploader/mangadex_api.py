@@ -1,19 +1,44 @@
 import json
 import logging
 import os
-from time import sleep, time
-from typing import IO, Callable
-from zipfile import ZipFile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import chain
+from time import monotonic, sleep, time
+from typing import Callable
 
 import requests
-from natsort import natsorted
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
+from mangadex_mass_uploader.chapter_cache import ChapterCache
+from mangadex_mass_uploader.query_planner import QueryPlan
+from mangadex_mass_uploader.rate_limiter import UUID_PATTERN, RateLimiter, route_of
+from mangadex_mass_uploader.request_stats import RequestStats, body_size
+from mangadex_mass_uploader.retry_policy import RetryPolicy
 from mangadex_mass_uploader.utils import Singleton
 
 
 class MangaDexAPI(metaclass=Singleton):
     API_URL = "https://api.mangadex.org"
     AUTH_URL = "https://auth.mangadex.org/realms/mangadex/protocol/openid-connect"
+    POOL_SIZE = 10
+    TRANSPORT_RETRIES = 3
+    # (connect, read) in seconds, so a stuck socket can't hang a worker forever
+    TIMEOUT = (10, 60)
+    MAX_IN_FLIGHT = 10
+    PAGE_FETCH_WORKERS = 5
+    # the most chapters a page, or ids in a single request, can have
+    IDS_PER_REQUEST = 100
+    # the API refuses offset + limit over this
+    MAX_OFFSET = 10_000
+    # filters that a query over the offset cap can be split on
+    PARTITION_PARAMS = ("translatedLanguage[]", "volume[]", "groups[]")
+    # endpoints that can be paginated by createdAt when nothing else can be split
+    CURSOR_ENDPOINTS = ("chapter",)
+    # endpoints that take updatedAtSince, so stale cached queries can be revalidated
+    REVALIDATE_ENDPOINTS = ("chapter",)
 
     def __init__(self):
         self.logger = logging.getLogger("main")
@@ -22,7 +47,53 @@ class MangaDexAPI(metaclass=Singleton):
         self._session_token: str | None = None
         self._refresh_token: str | None = None
         self._refresh_at: int | float | None = None
-        self._upload_session: str | None = None
+        self._refresh_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(self.MAX_IN_FLIGHT)
+        # shared by every thread, so parallel requests stay under the limits together
+        self.rate_limiter = RateLimiter()
+        self.cache = ChapterCache()
+        self.retry_policy = RetryPolicy()
+        self.stats = RequestStats()
+        # api and auth get separate pools so token refreshes never wait for an api connection
+        self._sessions: dict[str, requests.Session] = {
+            self.API_URL: requests.Session(),
+            self.AUTH_URL: requests.Session(),
+        }
+        self.set_pool_size(self.POOL_SIZE)
+
+    @classmethod
+    def new_pooled_adapter(cls, pool_size: int) -> HTTPAdapter:
+        # only connection errors are retried here, the request never reached the server so
+        # it's safe for any method. everything else is handled in send_request
+        retries = Retry(
+            total=cls.TRANSPORT_RETRIES,
+            connect=cls.TRANSPORT_RETRIES,
+            read=0,
+            redirect=0,
+            status=0,
+            other=0,
+            backoff_factor=0.5,
+        )
+        # each session only ever talks to one host, so a single pool per adapter is enough
+        return HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=retries
+        )
+
+    def set_pool_size(self, pool_size: int) -> None:
+        # replacing the adapter drops the old pools (and their connection counters)
+        for session in self._sessions.values():
+            session.mount("https://", self.new_pooled_adapter(pool_size))
+
+    @property
+    def connection_stats(self) -> dict[str, dict[str, int]]:
+        stats = {}
+        for url, session in self._sessions.items():
+            pool_manager = session.get_adapter(url).poolmanager
+            pools = [pool_manager.pools.get(key) for key in pool_manager.pools.keys()]
+            opened = sum(pool.num_connections for pool in pools if pool is not None)
+            sent = sum(pool.num_requests for pool in pools if pool is not None)
+            stats[url] = {"requests": sent, "new": opened, "reused": sent - opened}
+        return stats
 
     def login(
         self, username: str, password: str, client_id: str, client_secret: str, remember_me: str
@@ -91,94 +162,249 @@ class MangaDexAPI(metaclass=Singleton):
         api_url = self.AUTH_URL if auth_url else self.API_URL
         kwargs |= {"method": method, "url": f"{api_url}/{endpoint}"}
         if req_auth:
-            kwargs |= {"headers": {"Authorization": f"Bearer {self.session_token}"}}
-        response = requests.request(**kwargs)
-        if response.status_code == 429:
-            rate_limit_reset = int(response.headers["x-ratelimit-retry-after"])
-            self.logger.debug(f"ratelimit hit at {time()}, retry after {rate_limit_reset}")
-            sleep(rate_limit_reset - time() + 1)
-            self.logger.debug(f"ratelimit retrying at {time()}")
-            response = requests.request(**kwargs)
+            kwargs["headers"] = kwargs.get("headers", {}) | {
+                "Authorization": f"Bearer {self.session_token}"
+            }
+        kwargs.setdefault("timeout", self.TIMEOUT)
+        route = route_of(method, endpoint, auth_url)
+        response = self.send_with_retries(self._sessions[api_url], route, kwargs)
+        self.invalidate_cache(method, endpoint, auth_url)
         if not response.ok:
             on_error(response.status_code, response.json())
         return response.json()
 
+    def invalidate_cache(self, method: str, endpoint: str, auth_url: bool) -> None:
+        # writes make cached queries stale, along with the chapter they touched
+        if method.lower() != "get" and not auth_url:
+            chapter_id = UUID_PATTERN.search(endpoint) if "chapter/" in endpoint else None
+            self.cache.invalidate(chapter_id[0] if chapter_id else None)
+
+    def send_with_retries(
+        self, session: requests.Session, route: str, kwargs: dict
+    ) -> requests.Response:
+        # upload begin/commit, the routes that need checking before a retry, are only sent by
+        # the async client
+        attempt = 0
+        while True:
+            # the global limit only applies to the api host
+            waited = self.rate_limiter.acquire(route, global_limit=not route.endswith(" auth"))
+            if waited:
+                self.stats.record_wait(route, waited)
+            response = None
+            try:
+                with self._in_flight:
+                    started_at = monotonic()
+                    response = session.request(**kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                if not self.should_retry(route, attempt, started_at):
+                    raise
+                self.logger.debug(f"{route} failed with {exception!r}, retrying")
+            else:
+                if not self.should_retry(
+                    route, attempt, started_at, response, body_size(response.request.body)
+                ):
+                    return response
+            if response is None or response.status_code != 429:
+                sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+            self.stats.record_retry(route)
+
+    def should_retry(
+        self,
+        route: str,
+        attempt: int,
+        started_at: float,
+        response=None,
+        bytes_sent: int = 0,
+    ) -> bool:
+        """
+        Records an attempt at a request in the stats and the rate limiter, and tells whether it
+        should be sent again. response is None when none came back, otherwise it's either
+        client's response, they both have a status_code, headers and content.
+        """
+        latency = monotonic() - started_at
+        if response is None:
+            self.stats.record(route, latency, None)
+            return self.retry_policy.can_retry(route, attempt)
+        self.stats.record(route, latency, response.status_code, bytes_sent, len(response.content))
+        self.rate_limiter.update(route, response.headers)
+        if not self.retry_policy.can_retry(route, attempt, response.status_code):
+            return False
+        if response.status_code == 429:
+            rate_limit_reset = int(response.headers["x-ratelimit-retry-after"])
+            self.logger.debug(f"ratelimit hit at {time()}, retry after {rate_limit_reset}")
+            # the wait happens in the next reservation, for every request using the route
+            self.rate_limiter.block(route, rate_limit_reset)
+        else:
+            self.logger.debug(f"{route} failed with {response.status_code}, retrying")
+        return True
+
     @property
     def session_token(self) -> str:
-        if time() > self._refresh_at:
-            token = self.send_request(
-                "post",
-                "token",
-                False,
-                auth_url=True,
-                data={
-                    "grant_type": "refresh_token",
-                    "refresh_token": self._refresh_token,
-                    "client_id": self._client_id,
-                    "client_secret": self._client_secret,
-                },
-            )
-            self._session_token = token["access_token"]
-            self._refresh_token = token["refresh_token"]
-            self._refresh_at = time() + token["expires_in"] - 5
+        # the refresh token is single use, so concurrent requests must not refresh twice
+        with self._refresh_lock:
+            if self.session_token_expired:
+                self.refresh_session_token()
         return self._session_token
 
+    @property
+    def session_token_expired(self) -> bool:
+        return time() > self._refresh_at
+
+    def refresh_session_token(self) -> None:
+        token = self.send_request(
+            "post",
+            "token",
+            False,
+            auth_url=True,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": self._refresh_token,
+                "client_id": self._client_id,
+                "client_secret": self._client_secret,
+            },
+        )
+        self._session_token = token["access_token"]
+        self._refresh_token = token["refresh_token"]
+        self._refresh_at = time() + token["expires_in"] - 5
+
     @property
     def client_creds(self):
         return {"client_id": self._client_id, "client_secret": self._client_secret}
 
-    def get_upload_session(self) -> str | None:
-        response = self.send_request("get", "upload", on_error=self.raise_on_error_bypass_404)
-        if response["result"] == "ok":
-            self.logger.debug(f"Upload session ok: {response}")
-            return response["data"]["id"]
-        self.logger.debug(f"Upload session not ok (should be 404): {response}")
-
-    def start_upload(self, manga: str, groups: list[str]) -> None:
-        old_session = self.get_upload_session()
-        if old_session:
-            self.send_request("delete", f"upload/{old_session}")
-        response = self.send_request(
-            "post", "upload/begin", json={"manga": manga, "groups": groups}
-        )
-        self._upload_session = response["data"]["id"]
+    def upload_chapter(self, chapter: dict) -> None:
+        # the pages go out concurrently on the async client's event loop instead of a thread
+        # each, the calling thread just waits for the chapter to be done
+        from mangadex_mass_uploader.async_api import AsyncMangaDexAPI
 
-    # TODO batch pages
-    def upload_page(self, page: IO[bytes]) -> str:
-        response = self.send_request(
-            "post", f"upload/{self._upload_session}", files={"page": page}
-        )
-        return response["data"][0]["id"]
+        async_api = AsyncMangaDexAPI()
+        async_api.run(async_api.upload_chapter(chapter))
 
-    def commit_upload(self, chapter_draft: dict[str, str], page_order: list[str]) -> None:
-        self.send_request(
-            "post",
-            f"upload/{self._upload_session}/commit",
-            json={"chapterDraft": chapter_draft, "pageOrder": page_order},
+    def get_cached_pages(self, endpoint: str, params: dict, req_auth: bool = True) -> list[dict]:
+        cached = self.cache.get_query(endpoint, params)
+        if cached is not None and time() - cached[0] < self.cache.FRESH_FOR:
+            return cached[1]
+        fetched_at = time()
+        if cached is not None and endpoint in self.REVALIDATE_ENDPOINTS:
+            chapters = self.revalidate_pages(endpoint, params, req_auth, *cached)
+        else:
+            chapters = self.get_all_pages(endpoint, params, req_auth)
+        self.cache.put_query(endpoint, params, chapters, fetched_at)
+        return chapters
+
+    def revalidate_pages(
+        self, endpoint: str, params: dict, req_auth: bool, fetched_at: float, chapters: list[dict]
+    ) -> list[dict]:
+        """
+        Merges the chapters created/updated since the last fetch into the cached ones, usually
+        none. Chapters that were deleted or edited out of the query don't come back, but every
+        chapter still in it is in the merge, so it's only complete if it has as many chapters
+        as the query's total. Otherwise the query is fetched again in full.
+        """
+        total = self.send_request(
+            "get", endpoint, req_auth, params=params | {"limit": 1, "offset": 0}
+        )["total"]
+        updated = self.get_all_pages(endpoint, self.updated_since(params, fetched_at), req_auth)
+        merged = self.merge_updated(chapters, updated, total)
+        if merged is None:
+            return self.get_all_pages(endpoint, params, req_auth)
+        return merged
+
+    @staticmethod
+    def updated_since(params: dict, fetched_at: float) -> dict:
+        # the margin covers clock differences with the server
+        since = datetime.fromtimestamp(fetched_at - 60, timezone.utc)
+        return params | {"updatedAtSince": since.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    def merge_updated(
+        self, chapters: list[dict], updated: list[dict], total: int
+    ) -> list[dict] | None:
+        # None when the merge can't be trusted and the query has to be fetched again
+        updated = {chapter["id"]: chapter for chapter in updated}
+        chapters = [updated.pop(chapter["id"], chapter) for chapter in chapters]
+        chapters += updated.values()
+        if len(chapters) != total:
+            self.logger.debug(f"Cached query doesn't add up to its {total} chapters, refetching")
+            return None
+        self.logger.debug(f"Revalidated cached query, {len(updated)} new chapters")
+        return chapters
+
+    def get_all_pages(self, endpoint: str, params: dict, req_auth: bool = True) -> list[dict]:
+        params = params | {"limit": 100, "offset": 0}
+        response = self.send_request("get", endpoint, req_auth, params=params)
+        if response["total"] > self.MAX_OFFSET:
+            return self.get_partitioned_pages(endpoint, params, req_auth, response)
+        return self.get_remaining_pages(endpoint, params, req_auth, response)
+
+    def get_remaining_pages(
+        self, endpoint: str, params: dict, req_auth: bool, first_page: dict
+    ) -> list[dict]:
+        # once the total is known the rest of the pages are fetched concurrently,
+        # executor.map keeps them in offset order
+        offsets = range(100, min(first_page["total"], self.MAX_OFFSET), 100)
+        with ThreadPoolExecutor(self.PAGE_FETCH_WORKERS) as executor:
+            pages = executor.map(
+                lambda offset: self.send_request(
+                    "get", endpoint, req_auth, params=params | {"offset": offset}
+                )["data"],
+                offsets,
+            )
+            results = first_page["data"]
+            for page in pages:
+                results.extend(page)
+        return results
+
+    def get_partitioned_pages(
+        self, endpoint: str, params: dict, req_auth: bool, first_page: dict
+    ) -> list[dict]:
+        # split the query in half on a filter with several values, each half is fetched in
+        # parallel and split again if it's still over the offset cap
+        for key in self.PARTITION_PARAMS:
+            values = list(params.get(key) or [])
+            if len(values) < 2:
+                continue
+            partitions = [
+                params | {key: values[: len(values) // 2]},
+                params | {key: values[len(values) // 2 :]},
+            ]
+            with ThreadPoolExecutor(len(partitions)) as executor:
+                results = executor.map(
+                    lambda partition: self.get_all_pages(endpoint, partition, req_auth),
+                    partitions,
+                )
+                # chapters with several groups can show up in more than one partition
+                return list({chapter["id"]: chapter for chapter in chain(*results)}.values())
+        if endpoint in self.CURSOR_ENDPOINTS:
+            return self.get_pages_by_cursor(endpoint, params, req_auth)
+        self.logger.warn(
+            "There are more than 10,000 chapters selected, only the first 10,000 can be fetched."
         )
-        self._upload_session = None
+        return self.get_remaining_pages(endpoint, params, req_auth, first_page)
 
-    def upload_chapter(self, chapter: dict) -> None:
-        self.start_upload(chapter.pop("manga"), chapter.pop("groups"))
-        page_order = []
-        if "file" in chapter:
-            with ZipFile(chapter.pop("file")) as file:
-                pages = [
-                    page
-                    for page in natsorted(file.namelist())
-                    if page.endswith((".jpg", ".jpeg", ".png", ".gif"))
-                ]
-                for page in pages:
-                    page_order.append(self.upload_page(file.open(page)))
-        self.commit_upload(chapter, page_order)
+    def get_pages_by_cursor(self, endpoint: str, params: dict, req_auth: bool) -> list[dict]:
+        # nothing left to split on, so walk through the chapters in creation order and
+        # restart from the last createdAt every time the offset cap is reached
+        params = params | {"order[createdAt]": "asc"}
+        results = {}
+        while True:
+            first_page = self.send_request("get", endpoint, req_auth, params=params)
+            page = self.get_remaining_pages(endpoint, params, req_auth, first_page)
+            new_chapters = [chapter for chapter in page if chapter["id"] not in results]
+            results |= {chapter["id"]: chapter for chapter in new_chapters}
+            if first_page["total"] <= self.MAX_OFFSET or not new_chapters:
+                return list(results.values())
+            # createdAtSince doesn't take timezones, the boundary chapters are deduped by id
+            params = params | {"createdAtSince": page[-1]["attributes"]["createdAt"][:19]}
 
     def get_chapter_list(self, filters: dict) -> list[dict]:
         # API gets mad if you request shit with no filters so just return nothing
         if all(value is None for value in filters.values()):
             return []
+        return self.get_planned_pages("chapter", self.plan_chapter_query(filters), False)
+
+    @staticmethod
+    def plan_chapter_query(filters: dict) -> QueryPlan:
         # some hardcoded params
-        filters["limit"] = 100
-        filters["offset"] = 0
         filters["includeUnavailable"] = 1
         filters["contentRating[]"] = ["safe", "suggestive", "erotica", "pornographic"]
         # replace None with "none" for volumes
@@ -186,94 +412,70 @@ class MangaDexAPI(metaclass=Singleton):
             filters["volume[]"] = [
                 "none" if value is None else value for value in filters["volume[]"]
             ]
-        # chapter number filter is done client-side since API only accepts 1 chapter
-        chapter_filter = filters.pop("chapter numbers")
-        response = self.send_request("get", "chapter", False, params=filters)
-        total_chapters = response["total"]
-        if total_chapters > 10_000:
-            self.logger.warn(
-                "There are more than 10,000 chapters selected, only the first 10,000 can be fetched."
+        return QueryPlan(filters, filters.pop("chapter numbers"))
+
+    def get_planned_pages(self, endpoint: str, plan: QueryPlan, req_auth: bool) -> list[dict]:
+        if not plan.is_split:
+            return plan.filter(self.get_cached_pages(endpoint, plan.queries[0], req_auth))
+        with ThreadPoolExecutor(self.PAGE_FETCH_WORKERS) as executor:
+            results = executor.map(
+                lambda params: self.get_cached_pages(endpoint, params, req_auth), plan.queries
             )
-        chapter_list = response["data"]
-        while len(chapter_list) < total_chapters and filters["offset"] < 10_000 - 100:
-            filters["offset"] += 100
-            chapter_list.extend(self.send_request("get", "chapter", False, params=filters)["data"])
-        # apply chapter number filter
-        if chapter_filter is not None:
-            chapter_list_filtered = []
-            for chapter in chapter_list:
-                if chapter["attributes"]["chapter"] in chapter_filter["normal_filters"]:
-                    chapter_list_filtered.append(chapter)
-                    continue
-                for range_check in chapter_filter["range_filters"]:
-                    if range_check(chapter["attributes"]["chapter"]):
-                        chapter_list_filtered.append(chapter)
-                        break
-            chapter_list = chapter_list_filtered
-        return chapter_list
+            # each chapter only has one number, deduped just in case the api matches loosely
+            chapters = list({chapter["id"]: chapter for chapter in chain(*results)}.values())
+        return plan.filter(chapters)
 
     def get_unavailable_chapter_list(self, filters: dict) -> list[dict]:
         # API gets mad if you request shit with no filters so just return nothing
         if all(value is None for value in filters.values()):
             return []
-        # some hardcoded params
-        filters["limit"] = 100
-        filters["offset"] = 0
-        # replace None with "none" for volumes
-        if filters["volume[]"] is not None:
-            filters["volume[]"] = [
-                "none" if value is None else value for value in filters["volume[]"]
-            ]
-        # chapter number filter is done client-side since API only accepts 1 chapter
-        chapter_filter = filters.pop("chapter numbers")
-        volume_filter = filters.pop("volume[]")
-        response = self.send_request("get", "admin/chapter", params=filters)
-        total_chapters = response["total"]
-        if total_chapters > 10_000:
-            self.logger.warn(
-                "There are more than 10,000 chapters selected, only the first 10,000 can be fetched."
-            )
-        chapter_list = response["data"]
-        while len(chapter_list) < total_chapters and filters["offset"] < 10_000 - 100:
-            filters["offset"] += 100
-            chapter_list.extend(self.send_request("get", "admin/chapter", params=filters)["data"])
-        # apply chapter number filter
-        if chapter_filter is not None:
-            chapter_list_filtered = []
-            for chapter in chapter_list:
-                if chapter["attributes"]["chapter"] in chapter_filter["normal_filters"]:
-                    chapter_list_filtered.append(chapter)
-                    continue
-                for range_check in chapter_filter["range_filters"]:
-                    if range_check(chapter["attributes"]["chapter"]):
-                        chapter_list_filtered.append(chapter)
-                        break
-            chapter_list = chapter_list_filtered
-        if volume_filter is not None:
-            chapter_list_filtered = []
-            for chapter in chapter_list:
-                if chapter["attributes"]["volume"] in volume_filter:
-                    chapter_list_filtered.append(chapter)
-            chapter_list = chapter_list_filtered
-        return chapter_list
-
-    def get_chapters_by_id(self, chapter_ids: list[str]) -> list[dict]:
-        chapter_list = []
-        if len(chapter_ids) == 0:
-            return chapter_list
+        # the admin endpoint takes neither chapter numbers nor volumes, both are done client-side
+        plan = QueryPlan(
+            filters,
+            filters.pop("chapter numbers"),
+            filters.pop("volume[]"),
+            chapter_pushdown=False,
+        )
+        return self.get_planned_pages("admin/chapter", plan, True)
+
+    def get_chapters_by_id(
+        self, chapter_ids: list[str], include_unavailable: bool = False
+    ) -> list[dict]:
+        """
+        Chapters in the order of their ids, duplicates only once. Chapters fetched in the last
+        minute come from the cache, ids the API didn't return are logged and left out.
+        Deactivated and deleted chapters are only returned with include_unavailable.
+        """
+        chapter_ids = list(dict.fromkeys(chapter_ids))
+        chapters = self.cache.get_fresh_chapters(chapter_ids)
+        missing_ids = [chapter_id for chapter_id in chapter_ids if chapter_id not in chapters]
         # some hardcoded params
         filters = {
-            "limit": 100,
+            "limit": self.IDS_PER_REQUEST,
             "offset": 0,
             "contentRating[]": ["safe", "suggestive", "erotica", "pornographic"],
         }
-        # request 100 ids at a time
-        while len(chapter_ids) > 0:
-            filters["ids[]"] = chapter_ids[:100]
-            chapter_ids = chapter_ids[100:]
-            response = self.send_request("get", "chapter", False, params=filters)
-            chapter_list.extend(response["data"])
-        return chapter_list
+        if include_unavailable:
+            filters["includeUnavailable"] = 1
+        fetched_at = time()
+        with ThreadPoolExecutor(self.PAGE_FETCH_WORKERS) as executor:
+            pages = executor.map(
+                lambda start: self.send_request(
+                    "get",
+                    "chapter",
+                    False,
+                    params=filters | {"ids[]": missing_ids[start : start + self.IDS_PER_REQUEST]},
+                )["data"],
+                range(0, len(missing_ids), self.IDS_PER_REQUEST),
+            )
+            fetched = list(chain.from_iterable(pages))
+        self.cache.put_chapters(fetched, fetched_at)
+        chapters |= {chapter["id"]: chapter for chapter in fetched}
+        not_returned = [chapter_id for chapter_id in missing_ids if chapter_id not in chapters]
+        if not_returned:
+            self.logger.warning(f"{len(not_returned)} chapters could not be found")
+            self.logger.debug(f"Not found: {not_returned}")
+        return [chapters[chapter_id] for chapter_id in chapter_ids if chapter_id in chapters]
 
     def edit_chapter(self, chapter: dict) -> None:
         chapter.pop("manga")
@@ -3,11 +3,11 @@ import logging
 from kivy.clock import mainthread
 from natsort import natsorted
 from plyer import filechooser
-from requests import HTTPError
 
+from mangadex_mass_uploader.async_api import AsyncMangaDexAPI
 from mangadex_mass_uploader.chapter_parser import Chapter, parse_upload_input
-from mangadex_mass_uploader.mangadex_api import MangaDexAPI
-from mangadex_mass_uploader.utils import threaded, toggle_cancel
+from mangadex_mass_uploader.upload_scheduler import upload_chapters
+from mangadex_mass_uploader.utils import threaded, toggle_cancel, track_requests
 from mangadex_mass_uploader.widgets.app_screen import AppScreen
 from mangadex_mass_uploader.widgets.chapter_info_input import ReactiveInfoInput
 from mangadex_mass_uploader.widgets.preview_output import PreviewOutput
@@ -39,29 +39,20 @@ class UploaderScreen(AppScreen):
         self.selected_files = natsorted(self.selected_files)
         self.update_preview()
 
-    @threaded
-    def update_preview(self):
+    def render_preview(self) -> list[str]:
         self.chapters = parse_upload_input(self.iter_info_inputs(), self.selected_files)
-        preview_text = ""
-        for chapter in self.chapters:
-            preview_text += str(chapter)
-        if preview_text == "":
-            preview_text = "No chapters selected."
-        self.set_preview(preview_text)
+        return self.preview_renderer.render(self.chapters)
 
     @threaded
     @toggle_cancel("mass_upload_button")
+    @track_requests("upload")
     def mass_upload(self):
-        chapters = self.chapters.copy()
-        for idx, chapter in enumerate(chapters):
-            if self.action_cancelled:
-                logger.info(f"Another day, another disappointment")
-                self.action_cancelled = False
-                break
-            logger.info(f"Uploading chapter {idx + 1}/{len(chapters)}")
-            try:
-                MangaDexAPI().upload_chapter(chapter.to_api())
-            except HTTPError as exception:
-                logger.error(exception)
-                logger.error(f"Could not upload chapter {idx + 1}/{len(chapters)}")
-        logger.info(f"Done")
+        failed = upload_chapters(self.chapters.copy(), lambda: self.action_cancelled)
+        self.acknowledge_cancel()
+        logger.info("Done")
+        logger.info(f"Failed: {len(failed)}")
+        for chapter in failed:
+            logger.warning(
+                f"Failed: chapter {chapter.chapter} of {chapter.manga_id}, {chapter.file}"
+            )
+        logger.debug(f"Connections: {AsyncMangaDexAPI().connection_stats}")
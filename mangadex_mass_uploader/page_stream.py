@@ -0,0 +1,155 @@
+import io
+import mimetypes
+import mmap
+import os
+import struct
+import uuid
+from typing import IO
+from zipfile import ZIP_STORED, ZipFile, ZipInfo
+
+from natsort import natsorted
+
+PAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
+# local file header layout from the zip spec, the name and extra field lengths are at the end
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+class ChapterArchive:
+    """
+    Chapter zip that is opened once and shared by all of its page uploads.
+    Stored pages are read straight out of a memory map of the archive, and deflated pages are
+    decompressed chunk by chunk, so only one chunk per page is ever held in memory.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._zip = ZipFile(self._file)
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # empty files and some filesystems can't be mapped, pages are streamed instead
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._zip.close()
+        self._file.close()
+
+    @property
+    def pages(self) -> list[str]:
+        return [page for page in natsorted(self._zip.namelist()) if page.endswith(PAGE_EXTENSIONS)]
+
+    def page_stream(self, page: str, field_name: str = "page") -> "MultipartPageStream":
+        return MultipartPageStream(self, self._zip.getinfo(page), field_name)
+
+    def stored_page(self, info: ZipInfo) -> memoryview | None:
+        # encrypted pages can't be read raw either
+        if self._mmap is None or info.compress_type != ZIP_STORED or info.flag_bits & 0x1:
+            return None
+        header = LOCAL_HEADER.unpack_from(self._mmap, info.header_offset)
+        data_start = info.header_offset + LOCAL_HEADER.size + header[-2] + header[-1]
+        return memoryview(self._mmap)[data_start : data_start + info.file_size]
+
+    def open_page(self, info: ZipInfo) -> IO[bytes]:
+        return self._zip.open(info)
+
+
+class MultipartPageStream(io.RawIOBase):
+    """
+    multipart/form-data body for a single page, read lazily so that requests streams it
+    with a known Content-Length instead of building the whole body in memory.
+    """
+
+    def __init__(self, archive: ChapterArchive, info: ZipInfo, field_name: str):
+        super().__init__()
+        self._archive = archive
+        self._info = info
+        self.boundary = uuid.uuid4().hex
+        file_name = os.path.basename(info.filename)
+        content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        self._preamble = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{file_name}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        self._epilogue = f"\r\n--{self.boundary}--\r\n".encode()
+        self._stored = archive.stored_page(info)
+        self._page: IO[bytes] | None = None
+        self._position = 0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._preamble) + self._info.file_size + len(self._epilogue)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # only rewinding is needed, requests and urllib3 do that to resend a body on retries
+        if whence != io.SEEK_SET or offset not in (0, self._position):
+            raise io.UnsupportedOperation("MultipartPageStream can only be rewound")
+        if offset == 0 and self._page is not None:
+            self._page.close()
+            self._page = None
+        self._position = offset
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        chunk = self.read(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self) - self._position
+        chunk = b""
+        while len(chunk) < size and self._position < len(self):
+            part = self._read_part(size - len(chunk))
+            chunk += part
+            self._position += len(part)
+        return chunk
+
+    def _read_part(self, size: int) -> bytes:
+        body_start = len(self._preamble)
+        body_end = body_start + self._info.file_size
+        if self._position < body_start:
+            return self._preamble[self._position : self._position + size]
+        if self._position >= body_end:
+            offset = self._position - body_end
+            return self._epilogue[offset : offset + size]
+        size = min(size, body_end - self._position)
+        if self._stored is not None:
+            offset = self._position - body_start
+            return bytes(self._stored[offset : offset + size])
+        if self._page is None:
+            self._page = self._archive.open_page(self._info)
+        part = self._page.read(size)
+        if not part:
+            raise EOFError(f"{self._info.filename} is shorter than its zip entry says")
+        return part
+
+    def close(self) -> None:
+        if self._page is not None:
+            self._page.close()
+            self._page = None
+        # the archive's memory map can't be closed while views into it are still around
+        if self._stored is not None:
+            self._stored.release()
+            self._stored = None
+        super().close()
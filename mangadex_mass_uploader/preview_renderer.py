@@ -0,0 +1,32 @@
+from typing import Iterable
+
+from mangadex_mass_uploader.chapter_parser import Chapter, chapter_values
+
+
+class PreviewRenderer:
+    """
+    Formats chapters for the preview panel, one row of text per chapter. The text of every
+    chapter in the last preview is kept by the values of its fields, so only chapters that
+    changed since then are formatted again, and the previews of a 1000 chapter paste don't redo
+    all 1000 on every keystroke.
+    Each screen has its own, and only one preview job of a screen runs at a time.
+    """
+
+    EMPTY_TEXT = "No chapters selected."
+
+    def __init__(self):
+        self._rendered: dict[tuple, str] = {}
+
+    def render(self, chapters: Iterable[Chapter]) -> list[str]:
+        previous = self._rendered
+        rendered = {}
+        parts = []
+        for chapter in chapters:
+            # every field shows up in the preview, so a chapter is only the same if all of them are
+            key = chapter_values(chapter)
+            if key not in rendered:
+                rendered[key] = previous[key] if key in previous else str(chapter)
+            parts.append(rendered[key])
+        # only the chapters of the current preview are kept, so this never outgrows it
+        self._rendered = rendered
+        return parts or [self.EMPTY_TEXT]
@@ -0,0 +1,51 @@
+from natsort import natsorted
+
+from mangadex_mass_uploader.chapter_filter import ChapterFilter
+
+
+class QueryPlan:
+    """
+    Splits the filters of a chapter list into the queries sent to the API and the filtering
+    left for the client. Chapter numbers can only be given to the API one at a time, so a few
+    plain chapter numbers become one query each, and only the matching chapters are downloaded
+    instead of the whole manga. Ranges, null chapters and filters the endpoint doesn't take are
+    applied to the fetched chapters.
+    """
+
+    # past this many chapter numbers the separate queries cost more than fetching it all
+    MAX_CHAPTER_QUERIES = 20
+
+    def __init__(
+        self,
+        params: dict,
+        chapter_filter: ChapterFilter | None = None,
+        volume_filter: set[str] | None = None,
+        chapter_pushdown: bool = True,
+    ):
+        self.queries = [params]
+        self.chapter_filter = chapter_filter
+        self.volume_filter = volume_filter
+        chapters = chapter_filter.values if chapter_filter is not None else None
+        if (
+            chapter_pushdown
+            and chapters
+            and None not in chapters
+            and len(chapters) <= self.MAX_CHAPTER_QUERIES
+        ):
+            self.queries = [params | {"chapter": chapter} for chapter in natsorted(chapters)]
+
+    @property
+    def is_split(self) -> bool:
+        return len(self.queries) > 1
+
+    def filter(self, chapters: list[dict]) -> list[dict]:
+        # chapters pushed down to the API are checked again, it's cheap on the few that are left
+        if self.chapter_filter is not None:
+            chapters = self.chapter_filter.filter(chapters)
+        if self.volume_filter is not None:
+            chapters = [
+                chapter
+                for chapter in chapters
+                if chapter["attributes"]["volume"] in self.volume_filter
+            ]
+        return chapters
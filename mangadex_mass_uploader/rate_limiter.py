@@ -0,0 +1,139 @@
+import re
+import threading
+from time import monotonic, sleep, time
+from typing import Mapping
+
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def route_of(method: str, endpoint: str, auth_url: bool = False) -> str:
+    # ids are replaced so that every chapter/session shares the same bucket
+    if auth_url:
+        return f"{method.upper()} auth"
+    return f"{method.upper()} {UUID_PATTERN.sub('*', endpoint)}"
+
+
+class TokenBucket:
+    """
+    Plain token bucket, tokens are taken in advance so concurrent callers get staggered waits
+    instead of all waking up at the same time.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = monotonic()
+
+    def reserve(self) -> float:
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        return max(-self._tokens / self.rate, 0)
+
+
+class RouteBucket:
+    """
+    Bucket for a route with a server-side rate limit, filled from the x-ratelimit headers.
+    A few requests are always kept in reserve for the ones that are already in flight.
+    """
+
+    SAFETY_MARGIN = 1
+    # window length assumed until the first response of a window shows how long it lasts
+    DEFAULT_WINDOW = 60
+
+    def __init__(self):
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float = 0
+        self.window: float = self.DEFAULT_WINDOW
+        # whether reset_at is only a local guess that the headers haven't confirmed yet
+        self._guessed_reset = False
+
+    def reserve(self) -> float:
+        now = time()
+        if now >= self.reset_at:
+            # new window, refilled once. when it ends is guessed from the window length until a
+            # response sent in it gives the actual time. if the limit isn't known yet it's
+            # learned from the next response
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+            self._guessed_reset = True
+        if self.remaining is None:
+            return 0
+        if self.remaining > self.SAFETY_MARGIN:
+            self.remaining -= 1
+            return 0
+        return self.reset_at - time() + 1
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        if "x-ratelimit-limit" not in headers or "x-ratelimit-remaining" not in headers:
+            return
+        self.limit = int(headers["x-ratelimit-limit"])
+        remaining = int(headers["x-ratelimit-remaining"])
+        if "x-ratelimit-retry-after" not in headers:
+            self.remaining = (
+                remaining if self.remaining is None else min(self.remaining, remaining)
+            )
+            return
+        now = time()
+        reset_at = int(headers["x-ratelimit-retry-after"])
+        if reset_at <= now:
+            # sent in a window that has ended since, it says nothing about the current one
+            return
+        if remaining == self.limit - 1:
+            # first request of the server's window, which started about now
+            self.window = max(reset_at - now, 1)
+        if self.remaining is None or (reset_at > self.reset_at and not self._guessed_reset):
+            self.remaining = remaining
+        else:
+            # slots may have been reserved locally since this response was sent
+            self.remaining = min(self.remaining, remaining)
+        # the server's reset time replaces a guessed one even if it's earlier
+        if self._guessed_reset or reset_at > self.reset_at:
+            self.reset_at = reset_at
+            self._guessed_reset = False
+
+    def block(self, reset_at: float) -> None:
+        self.remaining = 0
+        self.reset_at = reset_at
+        self._guessed_reset = False
+
+
+class RateLimiter:
+    # the API allows 5 requests per second per IP on top of the per-route limits
+    GLOBAL_RATE = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global_bucket = TokenBucket(self.GLOBAL_RATE, self.GLOBAL_RATE)
+        self._route_buckets: dict[str, RouteBucket] = {}
+
+    def reserve(self, route: str, global_limit: bool = True) -> tuple[float, bool]:
+        """
+        Returns how long to wait before sending, and whether a slot was actually taken.
+        If it wasn't, reserve has to be called again after waiting.
+        """
+        with self._lock:
+            wait = self._route_buckets.setdefault(route, RouteBucket()).reserve()
+            if wait > 0:
+                return wait, False
+            return (self._global_bucket.reserve() if global_limit else 0), True
+
+    def acquire(self, route: str, global_limit: bool = True) -> float:
+        waited = 0
+        while True:
+            wait, reserved = self.reserve(route, global_limit)
+            sleep(wait)
+            waited += wait
+            if reserved:
+                return waited
+
+    def update(self, route: str, headers: Mapping[str, str]) -> None:
+        with self._lock:
+            self._route_buckets.setdefault(route, RouteBucket()).update(headers)
+
+    def block(self, route: str, reset_at: float) -> None:
+        with self._lock:
+            self._route_buckets.setdefault(route, RouteBucket()).block(reset_at)
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+logger = logging.getLogger("main")
+
+
+def body_size(body) -> int:
+    # bytes, json strings and page streams all have a length
+    return len(body) if body is not None else 0
+
+
+class RouteStats:
+    # latency histogram bucket bounds in seconds, the last one catches everything slower
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.rate_limit_wait = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.latency_counts = [0] * len(self.BUCKETS)
+
+    def percentile(self, fraction: float) -> float:
+        # upper bound of the bucket the percentile falls in
+        target = fraction * sum(self.latency_counts)
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.latency_counts):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "rate_limit_wait": round(self.rate_limit_wait, 3),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_sum": round(self.latency_sum, 3),
+            "latency_buckets": {
+                str(bound): count for bound, count in zip(self.BUCKETS, self.latency_counts)
+            },
+        }
+
+
+class RequestStats:
+    """
+    Counters and latency histograms for every API route, as given by route_of, so a slow run
+    can be pinned on the server (latency, errors) or on us (retries, rate limit waits).
+    Both clients record into the same stats, which count every request since launch, and each
+    mass run gets its own stats that only count the requests made while it runs. Those are
+    logged and saved when it finishes, as a json line in stats/runs.jsonl and in Prometheus'
+    text format in stats/latest.prom. Runs that overlap both count the requests made while
+    they overlap.
+    """
+
+    # Prometheus metric families, with their type and the route stats they're made of
+    METRICS = (
+        ("mangadex_requests_total", "counter", "requests"),
+        ("mangadex_request_errors_total", "counter", "errors"),
+        ("mangadex_request_retries_total", "counter", "retries"),
+        ("mangadex_rate_limited_total", "counter", "rate_limited"),
+        ("mangadex_rate_limit_wait_seconds_total", "counter", "rate_limit_wait"),
+        ("mangadex_sent_bytes_total", "counter", "bytes_sent"),
+        ("mangadex_received_bytes_total", "counter", "bytes_received"),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[str, RouteStats] = {}
+        self._runs: list[RequestStats] = []
+
+    def _route_stats(self, route: str) -> list[RouteStats]:
+        # the route's stats here and in every run in progress, the lock has to be held
+        return [stats._routes.setdefault(route, RouteStats()) for stats in (self, *self._runs)]
+
+    def record(
+        self,
+        route: str,
+        latency: float,
+        status_code: int | None,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ) -> None:
+        """
+        One attempt of a request, status_code is None when no response came back.
+        """
+        bucket = bisect_left(RouteStats.BUCKETS, latency)
+        with self._lock:
+            for stats in self._route_stats(route):
+                stats.requests += 1
+                stats.latency_sum += latency
+                stats.latency_counts[bucket] += 1
+                stats.bytes_sent += bytes_sent
+                stats.bytes_received += bytes_received
+                if status_code == 429:
+                    stats.rate_limited += 1
+                elif status_code is None or status_code >= 400:
+                    stats.errors += 1
+
+    def record_retry(self, route: str) -> None:
+        with self._lock:
+            for stats in self._route_stats(route):
+                stats.retries += 1
+
+    def record_wait(self, route: str, waited: float) -> None:
+        with self._lock:
+            for stats in self._route_stats(route):
+                stats.rate_limit_wait += waited
+
+    def to_dict(self) -> dict[str, dict]:
+        with self._lock:
+            return {route: stats.to_dict() for route, stats in sorted(self._routes.items())}
+
+    def to_prometheus(self) -> str:
+        routes = self.to_dict()
+        # the lines of a metric family have to be together, so it's families first, then routes
+        lines = ["# TYPE mangadex_request_duration_seconds histogram"]
+        for route, stats in routes.items():
+            cumulative = 0
+            for bound, count in stats["latency_buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(
+                    f'mangadex_request_duration_seconds_bucket{{route="{route}",le="{le}"}} '
+                    f"{cumulative}"
+                )
+            lines += [
+                f'mangadex_request_duration_seconds_sum{{route="{route}"}} {stats["latency_sum"]}',
+                f'mangadex_request_duration_seconds_count{{route="{route}"}} {stats["requests"]}',
+            ]
+        for name, metric_type, key in self.METRICS:
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines += [f'{name}{{route="{route}"}} {stats[key]}' for route, stats in routes.items()]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[str]:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            return [
+                f"{route}: {stats.requests} requests, "
+                f"p50 {stats.percentile(0.5)}s, p95 {stats.percentile(0.95)}s, "
+                f"{stats.errors} errors, {stats.retries} retries, {stats.rate_limited} 429s, "
+                f"{stats.rate_limit_wait:.1f}s rate limited, "
+                f"{stats.bytes_sent / 1e6:.2f}MB sent, {stats.bytes_received / 1e6:.2f}MB received"
+                for route, stats in routes
+            ]
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            if path.endswith(".prom"):
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), file, indent=2)
+
+    @contextmanager
+    def run(self, run_name: str) -> Iterator["RequestStats"]:
+        """
+        Stats of only the requests made during the run, logged and saved once it's over.
+        """
+        run_stats = RequestStats()
+        with self._lock:
+            self._runs.append(run_stats)
+        try:
+            yield run_stats
+        finally:
+            with self._lock:
+                self._runs.remove(run_stats)
+            run_stats.finish_run(run_name)
+
+    def finish_run(self, run_name: str) -> None:
+        routes = self.to_dict()
+        if not routes:
+            return
+        for line in self.summary():
+            logger.info(line)
+        stats_dir = f"{os.environ['KIVY_HOME']}/stats"
+        run = {"run": run_name, "finished_at": datetime.now().isoformat(timespec="seconds")}
+        try:
+            with open(f"{stats_dir}/runs.jsonl", "a") as file:
+                file.write(json.dumps(run | {"routes": routes}) + "\n")
+            self.save(f"{stats_dir}/latest.prom")
+        except OSError:
+            logger.exception("Could not save the request stats")
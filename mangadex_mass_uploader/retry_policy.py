@@ -0,0 +1,51 @@
+import random
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests can be sent again, based on the route from route_of.
+    Reads and idempotent writes are always retried, other POSTs only when the server says it
+    didn't process them, except for the ones the caller can check on before retrying.
+    """
+
+    # server hiccups, the request may or may not have been processed
+    RETRY_STATUSES = (500, 502, 503, 504)
+    IDEMPOTENT_METHODS = ("GET", "PUT", "DELETE")
+    # a repeated page just leaves an unused file in the session, the admin actions set a state
+    SAFE_POST_ROUTES = (
+        "POST upload/*",
+        "POST admin/chapter/*/activate",
+        "POST admin/chapter/*/restore",
+        "POST admin/chapter/*/move",
+    )
+    # these have to check whether the lost request went through before being sent again
+    CHECKED_POST_ROUTES = ("POST upload/begin", "POST upload/*/commit")
+
+    def __init__(self, max_retries: int = 4, backoff_base: float = 0.5, backoff_cap: float = 30):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def can_retry(self, route: str, attempt: int, status_code: int | None = None) -> bool:
+        """
+        status_code is None when no response came back at all (connection reset, timeout).
+        """
+        if attempt >= self.max_retries:
+            return False
+        # rate limited requests are rejected before they're processed
+        if status_code == 429:
+            return True
+        if status_code is not None and status_code not in self.RETRY_STATUSES:
+            return False
+        return (
+            route.split(" ")[0] in self.IDEMPOTENT_METHODS
+            or route in self.SAFE_POST_ROUTES
+            or route in self.CHECKED_POST_ROUTES
+        )
+
+    def needs_check(self, route: str) -> bool:
+        return route in self.CHECKED_POST_ROUTES
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter, so parallel workers that failed together don't retry together
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+
+from mangadex_mass_uploader.utils import Singleton
+
+
+class UploadJournal(metaclass=Singleton):
+    """
+    Append-only log of upload progress, so that an interrupted mass upload can skip the chapters
+    that were already committed and reuse the pages that are still in an open upload session.
+    Every event is one json line, the state of each chapter is rebuilt by replaying them.
+    """
+
+    def __init__(self):
+        self.path = f"{os.environ['KIVY_HOME']}/uploads/journal.jsonl"
+        self._lock = threading.Lock()
+        self._chapters: dict[str, dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                for line in file:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # last line of a journal that was cut off mid-write
+                        continue
+
+    @staticmethod
+    def chapter_key(chapter: dict) -> str:
+        # the archive's size and mtime are included so that a changed file is uploaded again
+        file_stat = None
+        if chapter.get("file") is not None:
+            stat = os.stat(chapter["file"])
+            file_stat = [stat.st_size, stat.st_mtime_ns]
+        key_data = json.dumps([chapter, file_stat], sort_keys=True, default=str)
+        return hashlib.sha1(key_data.encode()).hexdigest()
+
+    def _apply(self, event: dict) -> None:
+        chapter = self._chapters.setdefault(
+            event["key"], {"session": None, "pages": {}, "committed": False}
+        )
+        if event["event"] == "session":
+            # pages from any previous session are gone with it
+            if chapter["session"] != event["session"]:
+                chapter["pages"] = {}
+            chapter["session"] = event["session"]
+        elif event["event"] == "page":
+            chapter["pages"][event["page"]] = event["page_id"]
+        elif event["event"] == "commit":
+            chapter["committed"] = True
+
+    def _record(self, event: dict) -> None:
+        with self._lock:
+            self._apply(event)
+            with open(self.path, "a") as file:
+                file.write(json.dumps(event) + "\n")
+
+    def is_committed(self, key: str) -> bool:
+        return self._chapters.get(key, {}).get("committed", False)
+
+    def session(self, key: str) -> str | None:
+        return self._chapters.get(key, {}).get("session")
+
+    def uploaded_pages(self, key: str, session_id: str) -> dict[str, str]:
+        if self.session(key) != session_id:
+            return {}
+        return self._chapters[key]["pages"].copy()
+
+    def start_session(self, key: str, session_id: str) -> None:
+        self._record({"key": key, "event": "session", "session": session_id})
+
+    def add_page(self, key: str, page: str, page_id: str) -> None:
+        self._record({"key": key, "event": "page", "page": page, "page_id": page_id})
+
+    def commit(self, key: str) -> None:
+        self._record({"key": key, "event": "commit"})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chapters = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
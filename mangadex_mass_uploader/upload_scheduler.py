@@ -0,0 +1,32 @@
+import logging
+from typing import Callable
+
+from mangadex_mass_uploader.bulk_actions import run_bulk_action
+from mangadex_mass_uploader.chapter_parser import Chapter
+from mangadex_mass_uploader.mangadex_api import MangaDexAPI
+from mangadex_mass_uploader.upload_journal import UploadJournal
+
+logger = logging.getLogger("main")
+
+UPLOAD_LANES = 3
+
+
+def upload_chapters(
+    chapters: list[Chapter], is_cancelled: Callable[[], bool], lanes: int = UPLOAD_LANES
+) -> list[Chapter]:
+    """
+    Uploads chapters with up to `lanes` of them in flight at once, returns the chapters that
+    failed. The API only allows one open upload session, so only one chapter is actually
+    uploading at a time. The other lanes have their archive opened and wait for the session,
+    which saves that time between chapters.
+    """
+
+    def upload_chapter(label: str, chapter: Chapter) -> None:
+        logger.info(f"{label} - uploading chapter")
+        MangaDexAPI().upload_chapter(chapter.to_api())
+
+    _, failed = run_bulk_action(chapters, upload_chapter, is_cancelled, len(chapters), lanes)
+    # the journal is only needed to resume runs that didn't finish
+    if not failed and not is_cancelled():
+        UploadJournal().clear()
+    return failed
@@ -1,10 +1,5 @@
-import os
-import sys
 import threading
 
-from kivy.app import App
-from kivy.resources import resource_add_path
-
 
 def threaded(fun: callable) -> callable:
     def fun_threaded(*args, **kwargs):
@@ -23,7 +18,7 @@ def toggle_button(button_ids: str | list[str]) -> callable:
             for button_id in button_ids:
                 self.ids[button_id].disabled = True
             try:
-                method(self, *args, **kwargs)
+                return method(self, *args, **kwargs)
             finally:
                 for button_id in button_ids:
                     self.ids[button_id].disabled = False
@@ -39,7 +34,7 @@ def toggle_cancel(button_id: str) -> callable:
             button = self.ids[button_id].__self__
             self.place_cancel_button(button)
             try:
-                method(self, *args, **kwargs)
+                return method(self, *args, **kwargs)
             finally:
                 self.remove_cancel_button(button)
 
@@ -48,6 +43,20 @@ def toggle_cancel(button_id: str) -> callable:
     return cancel_toggle_decorator
 
 
+def track_requests(run_name: str) -> callable:
+    def track_requests_decorator(method: callable) -> callable:
+        def decorated_method(*args, **kwargs):
+            # the api client imports this module, so it can only be imported once it's running
+            from mangadex_mass_uploader.mangadex_api import MangaDexAPI
+
+            with MangaDexAPI().stats.run(run_name):
+                return method(*args, **kwargs)
+
+        return decorated_method
+
+    return track_requests_decorator
+
+
 class Singleton(type):
     _instances = {}
 
@@ -1,15 +1,34 @@
-from kivy.clock import mainthread
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine
+
+from kivy.clock import Clock, mainthread
 from kivy.uix.button import Button
 from kivy.uix.screenmanager import Screen
 
+from mangadex_mass_uploader.async_api import AsyncMangaDexAPI
+from mangadex_mass_uploader.preview_renderer import PreviewRenderer
 from mangadex_mass_uploader.utils import toggle_button
 from mangadex_mass_uploader.widgets.chapter_info_input import ChapterInfoInput, ReactiveInfoInput
 
+logger = logging.getLogger("main")
+
 
 class AppScreen(Screen):
+    # seconds without typing before the preview is updated
+    PREVIEW_DELAY = 0.3
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.action_cancelled: bool = False
+        self.preview_renderer = PreviewRenderer()
+        self._preview_trigger = Clock.create_trigger(
+            lambda _: self.update_preview(), self.PREVIEW_DELAY
+        )
+        self._preview_lock = threading.Lock()
+        self._preview_generation = 0
+        self._preview_running = False
         self._cancel_button: Button = Button(
             text="cancel",
             background_color="cc0000",
@@ -17,8 +36,45 @@ class AppScreen(Screen):
         )
 
     @mainthread
-    def set_preview(self, preview_text: str):
-        self.ids["preview"].text = preview_text
+    def set_preview(self, preview_rows: list[str]):
+        self.ids["preview"].rows = preview_rows
+
+    def schedule_preview(self):
+        # restarting the trigger on every change means a paste or a burst of typing is one update
+        self._preview_trigger.cancel()
+        self._preview_trigger()
+
+    def update_preview(self):
+        """
+        Runs render_preview in a background thread. Only one runs at a time, calls made while
+        it's running are coalesced into a single rerun with the latest inputs, and results that
+        are already stale by the time they're done are dropped.
+        """
+        with self._preview_lock:
+            self._preview_generation += 1
+            if self._preview_running:
+                return
+            self._preview_running = True
+        threading.Thread(target=self._run_preview, daemon=True).start()
+
+    def _run_preview(self):
+        while True:
+            with self._preview_lock:
+                generation = self._preview_generation
+            try:
+                preview_rows = self.render_preview()
+            except Exception:
+                logger.exception("Could not update the preview")
+                preview_rows = None
+            with self._preview_lock:
+                if generation == self._preview_generation:
+                    self._preview_running = False
+                    if preview_rows is not None:
+                        self.set_preview(preview_rows)
+                    return
+
+    def render_preview(self) -> list[str]:
+        return self.preview_renderer.render([])
 
     def iter_info_inputs(self) -> filter:
         return filter(lambda item: isinstance(item[1], ChapterInfoInput), self.ids.items())
@@ -41,6 +97,18 @@ class AppScreen(Screen):
     def cancel_action(self):
         self.action_cancelled = True
 
+    def acknowledge_cancel(self):
+        if self.action_cancelled:
+            logger.info(f"Another day, another disappointment")
+            self.action_cancelled = False
+
+    @staticmethod
+    def run_async(
+        coroutine: Coroutine[Any, Any, Any], on_done: Callable[[Future], None] | None = None
+    ) -> Future:
+        # the coroutine runs on the api's event loop, on_done gets the future on the ui thread
+        return AsyncMangaDexAPI().submit(coroutine, mainthread(on_done) if on_done else None)
+
     @mainthread
     def place_cancel_button(self, replaced_button: Button):
         idx = self.ids["buttons_container"].children.index(replaced_button)
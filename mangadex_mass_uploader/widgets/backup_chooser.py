@@ -0,0 +1,67 @@
+from typing import Callable
+
+from kivy.uix.button import Button
+from kivy.uix.popup import Popup
+
+from mangadex_mass_uploader.edit_backups import EditBackups
+from mangadex_mass_uploader.widgets.scrollbar_view import ScrollbarView
+
+
+class BackupRunButton(Button):
+    def __init__(self, chooser, run: dict, **kwargs):
+        self.chooser = chooser
+        self.run_id = run["id"]
+        super().__init__(
+            text=f"#{run['id']}  {run['started_at'].replace('T', ' ')}  -  "
+            f"{run['chapter_count']} chapters, {run['manga_count']} manga",
+            **kwargs,
+        )
+
+    def on_release(self):
+        self.chooser.choose(self.run_id)
+
+
+class BackupChooser(Popup):
+    """
+    Lists the edit runs in the backup store, the search box narrows them down to the runs that
+    touched a chapter or manga id.
+    """
+
+    def __init__(self, on_choice: Callable[[int], None], **kwargs):
+        self.on_choice = on_choice
+        super().__init__(**kwargs)
+        self.list_runs()
+
+    def list_runs(self, search: str = "") -> None:
+        container = self.ids["run_container"]
+        container.clear_widgets()
+        for run in EditBackups().runs(search.strip() or None):
+            container.add_widget(BackupRunButton(self, run))
+
+    def choose(self, run_id: int) -> None:
+        self.dismiss()
+        self.on_choice(run_id)
+
+
+class RestoreConfirmation(Popup):
+    """
+    Summary of what restoring a run would do, the restore only starts once it's confirmed.
+    """
+
+    def __init__(self, run_id: int, counts: dict[str, int], on_confirm: Callable[[int], None]):
+        self.run_id = run_id
+        self.on_confirm = on_confirm
+        super().__init__(title=f"Restore run #{run_id}")
+        self.ids["summary"].text = (
+            f"{counts['restore']} chapters will be restored to how they were before the run.\n"
+            f"{counts['unchanged']} chapters are already how they were and will be skipped.\n"
+            f"{counts['conflicted']} chapters were edited again since the run and will be "
+            f"skipped, use the cli's undo --force to restore those.\n"
+            f"{counts['missing']} chapters could not be found and will be skipped.\n\n"
+            f"The chapters to restore are in the preview."
+        )
+        self.ids["confirm_button"].disabled = not counts["restore"]
+
+    def confirm(self) -> None:
+        self.dismiss()
+        self.on_confirm(self.run_id)
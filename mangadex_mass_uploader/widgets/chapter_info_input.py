@@ -31,5 +31,5 @@ class ReactiveInfoInput(ChapterInfoInput):
             text=lambda *args: App.get_running_app()
             .root.ids["manager"]
             .get_screen(self.target_screen)
-            .update_preview()
+            .schedule_preview()
         )
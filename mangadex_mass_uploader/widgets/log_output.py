@@ -1,42 +1,82 @@
 import logging
 import os
+from collections import deque
 from datetime import datetime
 
-from kivy.clock import mainthread
-from kivy.config import Config
+from kivy.clock import Clock
+from kivy.properties import StringProperty
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.spinner import Spinner
 from kivy.uix.textinput import TextInput
 
 from mangadex_mass_uploader.widgets.scrollbar_view import ScrollbarView
 
 
-class LogOutput(ScrollbarView):
+class LogOutput(BoxLayout):
+    # panel updates per second, however many records come in
+    FLUSH_RATE = 10
+    MAX_LINES = 100
+    # records are kept at every level, so lowering the level filter shows recent debug logs
+    BUFFER_SIZE = 2000
+
+    text = StringProperty("")
+    level = StringProperty("INFO")
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         formatter = logging.Formatter(
             "%(asctime)s - %(levelname)-7s | %(message)s\n", datefmt="%Y-%m-%dT%H:%M:%S"
         )
-        panel_handler = APILogHandler(self, formatter)
-        panel_handler.setLevel("INFO")
+        self.panel_handler = LogBufferHandler(formatter, self.BUFFER_SIZE)
+        self.panel_handler.setLevel("DEBUG")
         file_handler = logging.FileHandler(
             f"{os.environ['KIVY_HOME']}/edit_logs/{datetime.now().strftime('%Y-%m-%dT%H_%M_%S')}.log"
         )
         file_handler.setFormatter(formatter)
         file_handler.setLevel("DEBUG")
         api_logger = logging.getLogger("main")
-        api_logger.addHandler(panel_handler)
+        api_logger.addHandler(self.panel_handler)
         api_logger.addHandler(file_handler)
         api_logger.setLevel("DEBUG")
+        self._flushed = 0
+        Clock.schedule_interval(self.flush, 1 / self.FLUSH_RATE)
+
+    def on_level(self, *_):
+        self._flushed = -1
+        self.flush()
 
+    def flush(self, *_):
+        # nothing was logged since the last flush, checked before the buffer is copied
+        if self.panel_handler.emitted == self._flushed:
+            return
+        emitted, lines = self.panel_handler.lines(logging.getLevelName(self.level), self.MAX_LINES)
+        self._flushed = emitted
+        self.text = "".join(lines)
 
-class APILogHandler(logging.Handler):
-    def __init__(self, output_panel: LogOutput, formatter: logging.Formatter):
+
+class LogBufferHandler(logging.Handler):
+    """
+    Keeps the last formatted records in a ring buffer. Emitting only appends to it, so the
+    threads that log never wait on the UI, which reads the buffer at its own pace.
+    """
+
+    def __init__(self, formatter: logging.Formatter, capacity: int):
         super().__init__()
-        self.output_panel = output_panel
         self.setFormatter(formatter)
+        self.records: deque[tuple[int, str]] = deque(maxlen=capacity)
+        self.emitted = 0
 
-    @mainthread
     def emit(self, record: logging.LogRecord) -> None:
-        # truncate old logs
-        old_text = self.output_panel.text.split("\n")
-        old_text = "\n".join(old_text[-100:])
-        self.output_panel.text = old_text + self.format(record)
+        # handle() already holds the handler lock here
+        try:
+            self.records.append((record.levelno, self.format(record)))
+        except Exception:
+            self.handleError(record)
+            return
+        self.emitted += 1
+
+    def lines(self, level: int, count: int) -> tuple[int, list[str]]:
+        with self.lock:
+            records = list(self.records)
+            emitted = self.emitted
+        return emitted, [text for levelno, text in records if levelno >= level][-count:]
@@ -1,19 +1,38 @@
+from kivy.clock import Clock
+from kivy.properties import ListProperty, StringProperty
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.textinput import TextInput
+
 from mangadex_mass_uploader.widgets.scrollbar_view import ScrollbarView
 
 
-class PreviewOutput(ScrollbarView):
-    @property
-    def text(self):
-        return self.ids["preview_text"].text
+class PreviewRow(TextInput):
+    pass
+
+
+class PreviewOutput(ScrollbarView, RecycleView):
+    """
+    One row per chapter, and only the rows that are on screen are actually laid out, so that
+    a selection of thousands of chapters doesn't turn into one huge text texture.
+    """
 
-    @text.setter
-    def text(self, value: str):
+    initial_text = StringProperty("")
+    rows = ListProperty()
+
+    def on_initial_text(self, _, value: str):
+        self.rows = [value]
+
+    def on_rows(self, _, rows: list[str]):
         # scroll position is saved so that the preview doesn't jump around every time you type
         scroll_position = (1 - self.scroll_y) * (self.viewport_size[1] - self.height)
-        self.ids["preview_text"].text = value
+        self.data = [{"text": row} for row in rows]
+        # the new rows are only laid out on the next frame
+        Clock.schedule_once(lambda _: self.restore_scroll_position(scroll_position))
+
+    def restore_scroll_position(self, scroll_position: float):
         # adjust scroll position to new viewport size
         scroll_size = self.viewport_size[1] - self.height
-        if scroll_size == 0:
+        if scroll_size <= 0:
             scroll_size = 1
         scroll_position = 1 - scroll_position / scroll_size
         self.scroll_y = min(max(scroll_position, 0), 1)
@@ -4,3 +4,8 @@ from invoke import task
 @task
 def build(c):
     c.run("pyinstaller mangadex_mass_uploader/main.spec")
+
+
+@task
+def bench(c):
+    c.run("python -m benchmarks.chapter_model")